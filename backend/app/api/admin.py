@@ -0,0 +1,117 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app import schemas
+from app.api.endpoints import get_current_user
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import Principal
+from app.services.embedding_migration import embedding_migration_service
+from app.services.vector_index import vector_index_service
+
+router = APIRouter()
+
+def _require_superuser(current_user: Principal = Depends(get_current_user)) -> Principal:
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return current_user
+
+@router.get("/admin/embeddings")
+def list_embedding_states(db: Session = Depends(get_db), current_user: Principal = Depends(_require_superuser)):
+    """
+    Embedding model per bot and the progress of any migration.
+    Bots that were never migrated are not listed; they use the default model.
+    """
+    return {
+        "default_model": settings.EMBEDDING_MODEL,
+        "bots": [schemas.BotEmbeddingState.model_validate(s) for s in embedding_migration_service.states(db)],
+    }
+
+@router.post("/admin/embeddings/migrations", response_model=List[schemas.BotEmbeddingState])
+def start_embedding_migration(
+    migration_in: schemas.EmbeddingMigrationCreate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(_require_superuser)
+):
+    """
+    Start re-embedding bots with another model in the background.
+    Chats keep using the current index until each bot is cut over.
+    """
+    try:
+        return embedding_migration_service.start(db, migration_in.target_model, migration_in.bot_ids, migration_in.auto_cutover)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/admin/embeddings/{bot_id}/{action}", response_model=schemas.BotEmbeddingState)
+async def change_embedding_state(
+    bot_id: str,
+    action: str,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(_require_superuser)
+):
+    """cutover: serve reads from the new index. rollback: cancel, or go back to the previous model. finalize: drop the previous index."""
+    handlers = {
+        "cutover": embedding_migration_service.cutover,
+        "rollback": embedding_migration_service.rollback,
+        "finalize": embedding_migration_service.finalize,
+    }
+    if action not in handlers:
+        raise HTTPException(status_code=404, detail="Unknown action")
+    try:
+        return await run_in_threadpool(handlers[action], db, bot_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/admin/vector-index")
+def vector_index_stats(
+    model: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(_require_superuser)
+):
+    """
+    Health of each embedding model's HNSW index: vector count per bot, parameters, on-disk
+    bytes and the share of deleted vectors (embedded mode only). Use it to decide on a rebuild.
+    """
+    return vector_index_service.stats(db, model)
+
+@router.put("/admin/vector-index", response_model=schemas.VectorIndexState)
+def configure_vector_index(
+    config_in: schemas.VectorIndexConfig,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(_require_superuser)
+):
+    """
+    Set HNSW parameters for a model's index. ef_search takes effect when Chroma next loads
+    the index (restart) or after a rebuild; space, max_neighbors and ef_construction need a rebuild.
+    """
+    try:
+        return vector_index_service.configure(
+            db,
+            config_in.model or settings.EMBEDDING_MODEL,
+            space=config_in.space,
+            max_neighbors=config_in.max_neighbors,
+            ef_construction=config_in.ef_construction,
+            ef_search=config_in.ef_search
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/admin/vector-index/rebuild", response_model=schemas.VectorIndexState)
+def rebuild_vector_index(
+    rebuild_in: schemas.VectorIndexRebuild,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(_require_superuser)
+):
+    """
+    Rebuild (and compact) a model's index online into a fresh collection, then swap it in.
+    Progress is visible in GET /admin/vector-index.
+    """
+    try:
+        return vector_index_service.rebuild(db, rebuild_in.model or settings.EMBEDDING_MODEL)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
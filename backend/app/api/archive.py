@@ -0,0 +1,107 @@
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app import models, schemas
+from app.api.endpoints import get_current_user
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import Principal
+from app.services.retention import retention_service
+
+router = APIRouter()
+
+def _authorize(domain_id: int, current_user: Principal):
+    if not current_user.can_access(domain_id):
+        raise HTTPException(status_code=404, detail="Domain not found or unauthorized")
+
+@router.get("/dashboard/{domain_id}/retention", response_model=schemas.RetentionPolicy)
+async def get_retention_policy(domain_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    """
+    Get the chat history retention policy for a domain.
+    Domains without their own policy use RETENTION_DEFAULT_DAYS (0 = keep forever).
+    """
+    _authorize(domain_id, current_user)
+    policy = db.query(models.RetentionPolicy).filter(models.RetentionPolicy.domain_id == domain_id).first()
+    if not policy:
+        return schemas.RetentionPolicy(
+            domain_id=domain_id,
+            retention_days=settings.RETENTION_DEFAULT_DAYS,
+            enabled=settings.RETENTION_DEFAULT_DAYS > 0,
+            is_default=True
+        )
+    return schemas.RetentionPolicy(domain_id=domain_id, retention_days=policy.retention_days, enabled=policy.enabled)
+
+@router.put("/dashboard/{domain_id}/retention", response_model=schemas.RetentionPolicy)
+async def update_retention_policy(
+    domain_id: int,
+    policy_in: schemas.RetentionPolicyUpdate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Set how many days of idle chat history stay in the database before being archived."""
+    _authorize(domain_id, current_user)
+    if policy_in.retention_days < 1:
+        raise HTTPException(status_code=400, detail="retention_days must be at least 1")
+    if not db.query(models.Domain.id).filter(models.Domain.id == domain_id).first():
+        raise HTTPException(status_code=404, detail="Domain not found or unauthorized")
+
+    policy = db.query(models.RetentionPolicy).filter(models.RetentionPolicy.domain_id == domain_id).first()
+    if policy:
+        policy.retention_days = policy_in.retention_days
+        policy.enabled = policy_in.enabled
+    else:
+        policy = models.RetentionPolicy(domain_id=domain_id, retention_days=policy_in.retention_days, enabled=policy_in.enabled)
+        db.add(policy)
+    db.commit()
+    return schemas.RetentionPolicy(domain_id=domain_id, retention_days=policy.retention_days, enabled=policy.enabled)
+
+@router.get("/dashboard/{domain_id}/archive", response_model=List[schemas.ArchivedSession])
+def query_archive(
+    domain_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    email: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Archived chat sessions for a domain, filtered by session start date and visitor email.
+    """
+    _authorize(domain_id, current_user)
+    limit = max(1, min(limit, 1000))
+    sessions = []
+    for i, record in enumerate(retention_service.iter_archive(domain_id, start, end, email)):
+        if i < offset:
+            continue
+        if len(sessions) >= limit:
+            break
+        sessions.append(record)
+    return sessions
+
+@router.get("/dashboard/{domain_id}/archive/export")
+async def export_archive(
+    domain_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    """Streams the archived sessions of a domain as NDJSON."""
+    _authorize(domain_id, current_user)
+    filename = f"chat-archive-domain-{domain_id}.ndjson"
+    return StreamingResponse(
+        retention_service.iter_export_lines(domain_id, start, end),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/admin/retention/run")
+async def run_retention(current_user: Principal = Depends(get_current_user)):
+    """Run a retention pass now (superuser only)."""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    results = await run_in_threadpool(retention_service.run_once)
+    return {"archived_sessions": results}
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.core.security import create_access_token, verify_password, get_password_hash
+from app.core.security import create_access_token, verify_password_async, get_password_hash_async, principal_claims
 from app import models, schemas
 from datetime import timedelta
 import uuid
@@ -12,13 +12,18 @@ router = APIRouter()
 @router.post("/login")
 async def login(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
     user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(subject=user.email)
+    # Embed what authorization needs so dashboard requests don't have to load the user
+    domain_ids = [row.id for row in db.query(models.Domain.id).filter(models.Domain.owner_id == user.id)]
+    access_token = create_access_token(
+        subject=user.email,
+        claims=principal_claims(user.id, user.is_superuser, domain_ids)
+    )
     return {
         "access_token": access_token, 
         "token_type": "bearer",
@@ -46,7 +51,7 @@ async def register(user_in: schemas.UserCreateWithDomain, db: Session = Depends(
 
     try:
         # Create user
-        hashed_password = get_password_hash(user_in.password)
+        hashed_password = await get_password_hash_async(user_in.password)
         new_user = models.User(
             email=user_in.email, 
             username=user_in.username,
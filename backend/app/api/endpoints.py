@@ -1,24 +1,33 @@
-from fastapi import Request, APIRouter, UploadFile, File, HTTPException, Body, status, Depends
+from fastapi import Request, APIRouter, UploadFile, File, Form, HTTPException, Body, status, Depends
 from pydantic import BaseModel
 from typing import List, Optional
-from app.services.ingestion import ingestion_service
-from app.services.vector_store import vector_store
-from langchain.chains import RetrievalQA
-from langchain_ollama import ChatOllama
+from app.services.ingestion import get_ingestion_service, archive_sources, file_source, url_source
+from app.services.vector_store import get_vector_store
+from app.services.llm import get_llm
+from app.services import analytics
+from app.services.chat_persistence import chat_writes, insert_session, merge_session
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
-from app.services.validate import validate_bot  
+from app.services.validate import validate_bot, resolve_domain
 from app.core.database import get_db
 from sqlalchemy.orm import Session
 from fastapi import Depends
 from app import models, schemas
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from app.core.security import SECRET_KEY, ALGORITHM
+from app.core.security import SECRET_KEY, ALGORITHM, decode_widget_token, Principal, principal_cache, principal_from_claims
+from datetime import datetime, time
 import uuid
+import zipfile
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Resolves the bearer token to a Principal. Tokens carry the user id, superuser flag and
+    owned domain ids, so this normally needs no query; older tokens without those claims
+    are resolved from the database once and cached for PRINCIPAL_CACHE_TTL_SECONDS.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -32,12 +41,38 @@ async def get_current_user(db: Session = Depends(get_db), token: str = Depends(o
         token_data = schemas.TokenData(email=email)
     except JWTError:
         raise credentials_exception
+
+    principal = principal_from_claims(payload)
+    if principal is not None:
+        return principal
+
+    principal = principal_cache.get(token_data.email)
+    if principal is not None:
+        return principal
+
     user = db.query(models.User).filter(models.User.email == token_data.email).first()
     if user is None:
         raise credentials_exception
-    return user
+    domain_ids = [row.id for row in db.query(models.Domain.id).filter(models.Domain.owner_id == user.id)]
+    principal = Principal(id=user.id, email=user.email, is_superuser=bool(user.is_superuser), domain_ids=tuple(domain_ids))
+    principal_cache.set(token_data.email, principal)
+    return principal
 
 
+def _identify_session(db: Session, session_id: str, user_email: str) -> bool:
+    """
+    Sets the session's email. Returns True if it had none, i.e. this made it a new lead; the
+    conditional UPDATE makes that true for exactly one request even across workers.
+    """
+    session = db.query(models.ChatSession).filter(models.ChatSession.id == session_id)
+    new_lead = session.filter(models.ChatSession.user_email.is_(None)).update(
+        {models.ChatSession.user_email: user_email}, synchronize_session=False
+    ) == 1
+    if not new_lead:
+        session.update({models.ChatSession.user_email: user_email}, synchronize_session=False)
+    db.commit()
+    return new_lead
+
 router = APIRouter()
 
 @router.post("/ingest/url")
@@ -52,8 +87,8 @@ async def ingest_url(request: schemas.UrlRequest, db: Session = Depends(get_db))
         if not domain:
             raise HTTPException(status_code=404, detail="Domain not found")
 
-        docs = await ingestion_service.ingest_url(str(request.url), request.botId)
-        vector_store.add_documents(docs)
+        docs = await get_ingestion_service().ingest_url(str(request.url), request.botId)
+        get_vector_store().add_documents(docs)
         
         metric = db.query(models.Metric).filter(models.Metric.domain_id == domain.id).first()
         if metric:
@@ -61,6 +96,8 @@ async def ingest_url(request: schemas.UrlRequest, db: Session = Depends(get_db))
         else:
             metric = models.Metric(domain_id=domain.id, sources_count=1)
             db.add(metric)
+        analytics.record_sources_added(db, domain.id)
+        analytics.record_documents(db, domain.id, [(str(request.url), "url")])
         db.commit()
 
         return {"message": f"Successfully ingested {len(docs)} chunks from {request.url}"}
@@ -90,13 +127,13 @@ async def ingest_file(
         filename = file.filename
         
         if filename.endswith(".pdf"):
-            docs = await ingestion_service.ingest_pdf(content, filename, botId)
+            docs = await get_ingestion_service().ingest_pdf(content, filename, botId)
         elif filename.endswith(".txt"):
-            docs = await ingestion_service.ingest_text(content.decode("utf-8"), botId, filename)
+            docs = await get_ingestion_service().ingest_text(content.decode("utf-8"), botId, filename)
         else:
             raise HTTPException(status_code=400, detail="Unsupported file format")
 
-        vector_store.add_documents(docs)
+        get_vector_store().add_documents(docs)
 
         metric = db.query(models.Metric).filter(models.Metric.domain_id == domain.id).first()
         if metric:
@@ -104,6 +141,8 @@ async def ingest_file(
         else:
             metric = models.Metric(domain_id=domain.id, sources_count=1)
             db.add(metric)
+        analytics.record_sources_added(db, domain.id)
+        analytics.record_documents(db, domain.id, [(filename, "pdf" if filename.endswith(".pdf") else "text")])
         db.commit()
 
         return {"message": f"Successfully ingested {len(docs)} chunks from {filename}"}
@@ -116,28 +155,88 @@ async def ingest_file(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
 
+@router.post("/ingest/bulk")
+async def ingest_bulk(
+    files: List[UploadFile] = File(default=[]),
+    urls: List[str] = Form(default=[]),
+    botId: str = Body(...),
+    hostname: str = Body(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Ingest many sources in one request: any mix of files (PDF, TXT, Markdown, HTML, DOCX),
+    zip archives of such files, and URLs (repeat the field or send one per line).
+    Returns a result per source; a failing source doesn't fail the others.
+    """
+    domain = db.query(models.Domain).filter(
+        models.Domain.bot_id == botId,
+        models.Domain.hostname == hostname
+    ).first()
+
+    if not domain:
+        raise HTTPException(status_code=404, detail="Domain not found")
+
+    sources = []
+    try:
+        for upload in files:
+            if upload.filename.lower().endswith(".zip"):
+                sources.extend(archive_sources(upload.filename, upload.file))
+            else:
+                sources.append(file_source(upload.filename, upload.file, upload.content_type))
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=f"Invalid zip archive: {str(e)}")
+    sources.extend(url_source(url) for field in urls for url in field.split() if url)
+
+    if not sources:
+        raise HTTPException(status_code=400, detail="No files or URLs to ingest")
+    if len(sources) > settings.BULK_MAX_SOURCES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BULK_MAX_SOURCES} sources per request")
+
+    results = await get_ingestion_service().ingest_bulk(sources, botId, get_vector_store())
+    ingested = sum(1 for result in results if result["status"] == "ingested")
+
+    if ingested:
+        try:
+            metric = db.query(models.Metric).filter(models.Metric.domain_id == domain.id).first()
+            if metric:
+                metric.sources_count += ingested
+            else:
+                metric = models.Metric(domain_id=domain.id, sources_count=ingested)
+                db.add(metric)
+            analytics.record_sources_added(db, domain.id, ingested)
+            analytics.record_documents(db, domain.id, [
+                (result["source"], result["type"]) for result in results if result["status"] == "ingested"
+            ])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
+
+    return {
+        "message": f"Successfully ingested {ingested} of {len(results)} sources",
+        "chunks": sum(result["chunks"] for result in results if result["status"] == "ingested"),
+        "sources": results,
+    }
+
 @router.post("/chat", response_model=schemas.ChatResponse)
 async def chat(request: schemas.ChatRequest, db: Session = Depends(get_db)):
     try:
         # 1. Validate Bot & Get Domain
-        domain = db.query(models.Domain).filter(
-            models.Domain.bot_id == request.botId,
-            models.Domain.hostname == request.hostname
-        ).first()
+        # A valid widget token already proves bot/hostname; only fall back to the DB without one
+        domain_id = None
+        if request.widgetToken:
+            claims = decode_widget_token(request.widgetToken)
+            if claims and claims.get("bot") == request.botId and claims.get("host") == request.hostname:
+                domain_id = claims.get("did")
 
-        # Handle local dev aliasing (127.0.0.1 <-> localhost)
-        if not domain and request.hostname in ['127.0.0.1', 'localhost']:
-            alt_hostname = 'localhost' if request.hostname == '127.0.0.1' else '127.0.0.1'
-            domain = db.query(models.Domain).filter(
-                models.Domain.bot_id == request.botId,
-                models.Domain.hostname == alt_hostname
-            ).first()
-        
-        if not domain:
-            raise HTTPException(status_code=403, detail=f"Bot '{request.botId}' not authorized for domain '{request.hostname}'")
+        if domain_id is None:
+            domain = resolve_domain(request.botId, request.hostname, db)
+            if not domain:
+                raise HTTPException(status_code=403, detail=f"Bot '{request.botId}' not authorized for domain '{request.hostname}'")
+            domain_id = domain.id
 
         # 1.5 Check for resources
-        metric = db.query(models.Metric).filter(models.Metric.domain_id == domain.id).first()
+        metric = db.query(models.Metric).filter(models.Metric.domain_id == domain_id).first()
         if not metric or metric.sources_count == 0:
             return schemas.ChatResponse(
                 answer="Please contact admin",
@@ -146,60 +245,53 @@ async def chat(request: schemas.ChatRequest, db: Session = Depends(get_db)):
             )
 
         # 2. Get or Create Session & Handle Deduplication
+        # Sessions are written directly so every worker sees them; messages and counters
+        # are written behind by chat_writes.
         session_id = request.sessionId
         user_email = request.userEmail
-        session = None
+        new_session = False
+        new_lead = False
+        identified = False
 
         if user_email:
             # Check for existing session with this email for this domain
-            existing_session = db.query(models.ChatSession).filter(
+            existing = db.query(models.ChatSession.id).filter(
                 models.ChatSession.user_email == user_email,
-                models.ChatSession.domain_id == domain.id
+                models.ChatSession.domain_id == domain_id
             ).first()
+            existing_id = existing.id if existing else None
 
-            if existing_session:
+            if existing_id:
                 # We found an existing user session
-                if session_id and session_id != existing_session.id:
-                    # User started anonymously but now identified as someone we know
-                    # Move messages from temp session to existing session
-                    temp_messages = db.query(models.ChatMessage).filter(models.ChatMessage.session_id == session_id).all()
-                    for msg in temp_messages:
-                        msg.session_id = existing_session.id
-                    
-                    # Delete the temp session
-                    temp_session = db.query(models.ChatSession).filter(models.ChatSession.id == session_id).first()
-                    if temp_session:
-                        db.delete(temp_session)
-                
-                session = existing_session
-                session_id = existing_session.id
-            
-        if not session:
+                if session_id and session_id != existing_id:
+                    # User started anonymously but now identified as someone we know:
+                    # move the temp session's messages over in one UPDATE and drop it
+                    await run_in_threadpool(chat_writes.flush)
+                    merge_session(db, session_id, existing_id)
+                    db.commit()
+                session_id = existing_id
+                identified = True
+
+        if not identified:
             # No existing email session or no email provided yet
-            if not session_id:
-                session_id = str(uuid.uuid4())
-                session = models.ChatSession(id=session_id, domain_id=domain.id)
-                db.add(session)
-            else:
-                session = db.query(models.ChatSession).filter(models.ChatSession.id == session_id).first()
-                if not session:
-                    session = models.ChatSession(id=session_id, domain_id=domain.id)
-                    db.add(session)
-            
-            # Identify the session if email provided now
-            if user_email:
-                session.user_email = user_email
-        
-        # 4. Store User Message
-        user_msg = models.ChatMessage(session_id=session_id, role="user", content=request.question)
-        db.add(user_msg)
+            exists = session_id and db.query(models.ChatSession.id).filter(models.ChatSession.id == session_id).first()
+            if not exists:
+                # Created once the answer is ready, so a failed answer leaves no empty session
+                session_id = session_id or str(uuid.uuid4())
+                new_session = True
+            elif user_email:
+                # Identify the session now that an email was provided
+                new_lead = _identify_session(db, session_id, user_email)
+
+        asked_at = datetime.utcnow()
         
         # 5. Generate Answer
-        llm = ChatOllama(model="llama3.2", temperature=0) 
+        from langchain.chains import RetrievalQA
+
         qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
+            llm=get_llm(),
             chain_type="stuff",
-            retriever=vector_store.get_retriever(bot_id=request.botId),
+            retriever=get_vector_store().get_retriever(bot_id=request.botId),
             return_source_documents=True
         )
         
@@ -208,16 +300,34 @@ async def chat(request: schemas.ChatRequest, db: Session = Depends(get_db)):
         source_docs = result["source_documents"]
         sources = list(set([doc.metadata.get("source", "unknown") for doc in source_docs]))
         
-        # 6. Store Assistant Message
-        assistant_msg = models.ChatMessage(session_id=session_id, role="assistant", content=answer)
-        db.add(assistant_msg)
-        
-        # 7. Update Metrics
-        metric = db.query(models.Metric).filter(models.Metric.domain_id == domain.id).first()
-        if metric:
-            metric.chats_count += 1
-        
-        db.commit()
+        # 6. Create the session; if another worker just created it, this is not a new session
+        if new_session:
+            new_session = insert_session(db, session_id, domain_id, user_email)
+            db.commit()
+            if new_session:
+                new_lead = bool(user_email)
+            elif user_email:
+                new_lead = _identify_session(db, session_id, user_email)
+
+        # First question of this session today? (counts towards daily unique sessions)
+        first_today = new_session or not (
+            chat_writes.has_pending_messages(session_id)
+            or db.query(models.ChatMessage.id).filter(
+                models.ChatMessage.session_id == session_id,
+                models.ChatMessage.timestamp >= datetime.combine(datetime.utcnow().date(), time.min)
+            ).first()
+        )
+
+        # 7. Queue both messages and the counters; they are committed in the next batch
+        exchange = (session_id, domain_id, request.question, asked_at, answer, datetime.utcnow())
+        increments = analytics.chat_increments(domain_id, sources, first_today=first_today, new_lead=new_lead)
+        if not chat_writes.add_chat(*exchange, increments=increments):
+            # Queue full or shutting down: write this exchange now
+            try:
+                await run_in_threadpool(chat_writes.write_now, *exchange, increments=increments)
+            except Exception as e:
+                print(f"Synchronous chat write failed: {e}")
+                raise HTTPException(status_code=503, detail="Chat history is temporarily unavailable, please retry")
         
         return schemas.ChatResponse(answer=answer, sources=sources, sessionId=session_id)
     except HTTPException as he:
@@ -232,7 +342,7 @@ async def chat(request: schemas.ChatRequest, db: Session = Depends(get_db)):
 async def list_domain_documents(
     domain_id: int, 
     db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     try:
         domain = db.query(models.Domain).filter(models.Domain.id == domain_id).first()
@@ -242,7 +352,7 @@ async def list_domain_documents(
         if not current_user.is_superuser and domain.owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="Unauthorized")
 
-        documents = vector_store.list_documents(bot_id=domain.bot_id)
+        documents = get_vector_store().list_documents(bot_id=domain.bot_id)
         return {"documents": documents}
     except HTTPException as he:
         raise he
@@ -254,7 +364,7 @@ async def delete_domain_document(
     domain_id: int,
     source: str = Body(..., embed=True),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     try:
         domain = db.query(models.Domain).filter(models.Domain.id == domain_id).first()
@@ -264,13 +374,14 @@ async def delete_domain_document(
         if not current_user.is_superuser and domain.owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="Unauthorized")
 
-        vector_store.delete_document(source=source, bot_id=domain.bot_id)
-        
+        get_vector_store().delete_document(source=source, bot_id=domain.bot_id)
+        analytics.remove_document(db, domain.id, source)
+
         # Update metrics
         metric = db.query(models.Metric).filter(models.Metric.domain_id == domain.id).first()
         if metric and metric.sources_count > 0:
             metric.sources_count -= 1
-            db.commit()
+        db.commit()
             
         return {"message": "Document deleted successfully"}
     except HTTPException as he:
@@ -298,7 +409,7 @@ async def validate_bot_endpoint(request: Request, db: Session = Depends(get_db))
         raise HTTPException(status_code=500, detail=f"Validation failed: {str(e)}")
 
 @router.get("/dashboard", response_model=List[schemas.Domain])
-async def get_dashboard(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def get_dashboard(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     """
     Get all domains and their metrics. 
     Main Admin (SuperUser) sees everything.
@@ -309,21 +420,36 @@ async def get_dashboard(db: Session = Depends(get_db), current_user: models.User
     else:
         domains = db.query(models.Domain).filter(models.Domain.owner_id == current_user.id).all()
     return domains
+
+@router.get("/dashboard/summary", response_model=schemas.DashboardSummary)
+def get_dashboard_summary(
+    days: int = 30,
+    leads_limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Everything the dashboard needs for all of the user's domains in one response:
+    metrics, daily analytics for the last `days` days, top cited sources, recent leads
+    with their messages, and trained documents.
+    """
+    days = max(1, min(days, 366))
+    leads_limit = max(1, min(leads_limit, 500))
+    return analytics.dashboard_summary(db, current_user, days=days, leads_limit=leads_limit)
+
 @router.get("/dashboard/{domain_id}/metrics", response_model=schemas.Metric)
-async def get_domain_metrics(domain_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def get_domain_metrics(domain_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     """
     Get metrics for a specific domain. Only owner or superuser can access.
     """
-    query = db.query(models.Domain).filter(models.Domain.id == domain_id)
-    if not current_user.is_superuser:
-        query = query.filter(models.Domain.owner_id == current_user.id)
-    
-    domain = query.first()
-    if not domain:
+    if not current_user.can_access(domain_id):
         raise HTTPException(status_code=404, detail="Domain not found or unauthorized")
     
     metric = db.query(models.Metric).filter(models.Metric.domain_id == domain_id).first()
     if not metric:
+        # Only create metrics for domains that actually exist
+        if not db.query(models.Domain.id).filter(models.Domain.id == domain_id).first():
+            raise HTTPException(status_code=404, detail="Domain not found or unauthorized")
         metric = models.Metric(domain_id=domain_id, chats_count=0, sources_count=0)
         db.add(metric)
         db.commit()
@@ -334,7 +460,7 @@ async def get_domain_metrics(domain_id: int, db: Session = Depends(get_db), curr
 async def get_dashboard_leads(
     domain_id: Optional[int] = None,
     db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Get chat sessions with emails.
@@ -343,16 +469,11 @@ async def get_dashboard_leads(
     
     if domain_id:
         # Security check: Ensure domain belongs to user or user is superuser
-        if not current_user.is_superuser:
-            domain = db.query(models.Domain).filter(
-                models.Domain.id == domain_id, 
-                models.Domain.owner_id == current_user.id
-            ).first()
-            if not domain:
-                raise HTTPException(status_code=403, detail="Not authorized to view leads for this domain")
+        if not current_user.can_access(domain_id):
+            raise HTTPException(status_code=403, detail="Not authorized to view leads for this domain")
         query = query.filter(models.ChatSession.domain_id == domain_id)
     elif not current_user.is_superuser:
-        domain_ids = [d.id for d in current_user.domains]
+        domain_ids = list(current_user.domain_ids)
         query = query.filter(models.ChatSession.domain_id.in_(domain_ids))
         
     sessions = query.order_by(models.ChatSession.created_at.desc()).all()
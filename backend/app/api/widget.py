@@ -0,0 +1,109 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import create_widget_token
+from app.services.validate import resolve_domain
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+router = APIRouter()
+
+_script_cache = {}
+_script_lock = threading.Lock()
+
+
+def _etag(payload: bytes) -> str:
+    return '"' + hashlib.sha256(payload).hexdigest()[:32] + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match", "")
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(",")) or header.strip() == "*"
+
+
+def _load_script():
+    """Reads and gzips the widget script once per file version."""
+    path = settings.WIDGET_SCRIPT_PATH
+    mtime = os.path.getmtime(path)
+    cached = _script_cache.get(path)
+    if cached and cached["mtime"] == mtime:
+        return cached
+    with _script_lock:
+        with open(path, "rb") as f:
+            raw = f.read()
+        cached = {
+            "mtime": mtime,
+            "raw": raw,
+            "gzip": gzip.compress(raw, compresslevel=9, mtime=0),
+            "etag": _etag(raw),
+        }
+        _script_cache[path] = cached
+    return cached
+
+
+@router.get("/widget/bootstrap")
+def widget_bootstrap(botId: str, hostname: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Cacheable replacement for POST /validateBot.
+    Validates the bot for the hostname and returns a short-lived signed widget token that
+    /chat accepts instead of looking the domain up again. Tokens are issued per time bucket,
+    so every visitor of a site gets the same response (and ETag) until the bucket rolls over.
+    """
+    if not botId or not hostname:
+        raise HTTPException(status_code=400, detail="Bot ID and hostname are required")
+
+    domain = resolve_domain(botId, hostname, db)
+    if not domain:
+        raise HTTPException(status_code=403, detail=f"Unauthorized hostname '{hostname}' for this bot")
+
+    ttl = settings.WIDGET_TOKEN_TTL_SECONDS
+    bucket = max(1, ttl // 3)
+    now = int(time.time())
+    issued_at = now - now % bucket
+    expires_at = issued_at + ttl
+
+    body = json.dumps({
+        "botId": botId,
+        "hostname": hostname,
+        "token": create_widget_token(botId, hostname, domain.id, issued_at, expires_at),
+        "expiresAt": expires_at,
+    }).encode("utf-8")
+
+    # Cached copies are served until the bucket ends, so a client always gets a token
+    # with at least ttl - bucket seconds of validity left.
+    max_age = issued_at + bucket - now
+    headers = {
+        "ETag": _etag(body),
+        "Cache-Control": f"public, max-age={max_age}, s-maxage={max_age}",
+    }
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/widget/aiSiteBot.js")
+def widget_script(request: Request):
+    """Serves the embeddable widget script, pre-gzipped, with long-lived cache headers."""
+    try:
+        script = _load_script()
+    except OSError:
+        raise HTTPException(status_code=404, detail="Widget script not found")
+
+    max_age = settings.WIDGET_SCRIPT_MAX_AGE
+    headers = {
+        "ETag": script["etag"],
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={max_age * 7}",
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(request, script["etag"]):
+        return Response(status_code=304, headers=headers)
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=script["gzip"], media_type="application/javascript", headers=headers)
+    return Response(content=script["raw"], media_type="application/javascript", headers=headers)
@@ -12,8 +12,94 @@ class Settings(BaseSettings):
     # OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     
+    # Auth
+    # Threads doing pbkdf2 hashing, and how many hash/verify calls may be in flight at once;
+    # excess logins wait for a slot instead of piling up on the pool.
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_CONCURRENCY: int = 4
+    # How long a principal resolved from the database (older tokens without claims) is reused
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+
+    # Ollama
+    OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    LLM_MODEL: str = "llama3.2"
+    # Default embedding model, used by bots that have no BotEmbeddingState row.
+    # Only change it once every existing bot has been migrated and cut over.
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+    # Preload the models and prime the vector store before the worker reports ready
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+    OLLAMA_KEEP_ALIVE: str = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+    # Ingestion
+    # Chunks are cut at heading/paragraph boundaries up to this many tokens (cl100k_base)
+    CHUNK_TOKENS: int = 300
+    # Only applied when a single paragraph is longer than CHUNK_TOKENS and must be cut mid-text
+    CHUNK_OVERLAP_TOKENS: int = 30
+    # Inputs larger than this are chunked in the process pool instead of inline
+    CHUNK_PARALLEL_MIN_CHARS: int = 200_000
+    # Size of the ingestion process pool; 0 means one process per CPU
+    INGESTION_WORKERS: int = int(os.getenv("INGESTION_WORKERS", "0"))
+    # Bulk ingestion limits: sources per request, and size of any single file/archive entry/page
+    BULK_MAX_SOURCES: int = 1000
+    BULK_MAX_SOURCE_BYTES: int = 50 * 1024 * 1024
+    # Chunks from all sources of a bulk request are embedded and upserted in batches of this size
+    BULK_EMBED_BATCH_SIZE: int = 256
+    BULK_URL_CONCURRENCY: int = 8
+    URL_FETCH_TIMEOUT_SECONDS: int = 30
+
+    # Embeddable widget
+    # Bootstrap tokens are issued per time bucket (a third of the TTL) so the response
+    # is identical, and cacheable, for everyone loading the widget within that bucket.
+    WIDGET_TOKEN_TTL_SECONDS: int = 900
+    WIDGET_SCRIPT_PATH: str = os.getenv(
+        "WIDGET_SCRIPT_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "frontend", "aiSiteBot.js")
+    )
+    WIDGET_SCRIPT_MAX_AGE: int = 86400
+
+    # Chat persistence
+    # New sessions, messages and counters are written in batches by a background writer:
+    # flushed after this many milliseconds, or sooner once this many rows are queued
+    CHAT_WRITE_FLUSH_MS: int = int(os.getenv("CHAT_WRITE_FLUSH_MS", "20"))
+    CHAT_WRITE_BATCH_ROWS: int = 500
+    # A batch failing this many times in a row is appended to the dead-letter file and dropped
+    CHAT_WRITE_MAX_RETRIES: int = 5
+    CHAT_WRITE_DEAD_LETTER_FILE: str = os.getenv("CHAT_WRITE_DEAD_LETTER_FILE", "chat_write_failures.jsonl")
+    # Beyond this many queued rows /chat writes synchronously instead of queuing
+    CHAT_WRITE_QUEUE_LIMIT: int = 20000
+
+    # Chat history retention
+    # Archived sessions are written here as zstd-compressed JSONL, partitioned by domain and day
+    ARCHIVE_DIRECTORY: str = os.getenv("ARCHIVE_DIRECTORY", "chat_archive")
+    # Default for domains without their own policy; 0 keeps history forever
+    RETENTION_DEFAULT_DAYS: int = int(os.getenv("RETENTION_DEFAULT_DAYS", "0"))
+    RETENTION_ENABLED: bool = os.getenv("RETENTION_ENABLED", "true").lower() == "true"
+    RETENTION_INTERVAL_SECONDS: int = 3600
+    RETENTION_BATCH_SIZE: int = 200
+    RETENTION_VACUUM_PAGES: int = 2000
+
+    # Embedding migrations
+    # Chunks re-embedded per batch, and pause between batches to keep load on Ollama/Chroma low
+    REEMBED_BATCH_SIZE: int = 64
+    REEMBED_PAUSE_SECONDS: float = 0.5
+    # How long each worker caches the bot -> embedding model mapping
+    EMBEDDING_STATE_CACHE_SECONDS: int = 5
+
     # Vector DB
     CHROMA_PERSIST_DIRECTORY: str = "chroma_db"
+    # "embedded" opens the persist directory in-process (development, single worker).
+    # "server" connects to a shared `chroma run` process so several workers can share one index.
+    CHROMA_MODE: str = os.getenv("CHROMA_MODE", "embedded")
+    CHROMA_SERVER_HOST: str = os.getenv("CHROMA_SERVER_HOST", "localhost")
+    CHROMA_SERVER_PORT: int = int(os.getenv("CHROMA_SERVER_PORT", "8001"))
+    # Default HNSW parameters for new collections; per-model overrides live in vector_indexes.
+    # Space, M and ef_construction only change through a rebuild; ef_search whenever the index is (re)loaded.
+    CHROMA_HNSW_SPACE: str = os.getenv("CHROMA_HNSW_SPACE", "l2")
+    CHROMA_HNSW_M: int = 16
+    CHROMA_HNSW_EF_CONSTRUCTION: int = 100
+    CHROMA_HNSW_EF_SEARCH: int = 100
+    # Vectors copied per batch when an index is rebuilt into a fresh collection
+    INDEX_REBUILD_BATCH_SIZE: int = 1000
     
     class Config:
         case_sensitive = True
@@ -0,0 +1,35 @@
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def acquire_exclusive_lock(path: str):
+    """
+    Takes a non-blocking exclusive lock on `path`.
+    Returns the open lock file (keep a reference to hold the lock) or None if another process owns it.
+    """
+    handle = open(path, "a+")
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    return handle
+
+
+def read_lock_owner(path: str) -> str:
+    """Returns the pid recorded in a lock file, or an empty string."""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
@@ -1,25 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Any, Union
-from jose import jwt
+from jose import JWTError, jwt
 from passlib.context import CryptContext
+from app.core.config import settings
+import asyncio
+import threading
+import time
+import weakref
 
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
+# Password hashing is deliberately slow CPU work; run it on its own small pool so a burst
+# of logins can't stall the event loop or take over the default threadpool.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_slots = weakref.WeakKeyDictionary()
+
 SECRET_KEY = "your-secret-key-for-dev-only" # In production, use environment variable
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated dashboard user, as far as authorization needs to know."""
+    id: int
+    email: str
+    is_superuser: bool
+    domain_ids: tuple
+
+    def can_access(self, domain_id: int) -> bool:
+        return self.is_superuser or domain_id in self.domain_ids
+
+class TTLCache:
+    """Small thread-safe mapping whose entries expire `ttl` seconds after being set."""
+
+    def __init__(self, ttl: float, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                now = time.monotonic()
+                self._data = {k: v for k, v in self._data.items() if v[1] >= now}
+                if len(self._data) >= self.maxsize:
+                    self._data.pop(next(iter(self._data)))
+            self._data[key] = (value, time.monotonic() + self.ttl)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+# Principals for tokens issued before claims were embedded, keyed by email
+principal_cache = TTLCache(ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None, claims: dict = None) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {"exp": expire, "sub": str(subject)}
+    if claims:
+        to_encode.update(claims)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def principal_claims(user_id: int, is_superuser: bool, domain_ids) -> dict:
+    """Claims embedded in access tokens so requests can be authorized without a User query."""
+    return {"uid": user_id, "su": bool(is_superuser), "dids": sorted(domain_ids)}
+
+def principal_from_claims(payload: dict):
+    """Builds a Principal from access token claims, or None for tokens without them."""
+    if "uid" not in payload:
+        return None
+    return Principal(
+        id=payload["uid"],
+        email=payload["sub"],
+        is_superuser=bool(payload.get("su")),
+        domain_ids=tuple(payload.get("dids", ()))
+    )
+
+def create_widget_token(bot_id: str, hostname: str, domain_id: int, issued_at: int, expires_at: int) -> str:
+    """Signed, stateless proof that `bot_id` was validated for `hostname`; checked by /chat."""
+    to_encode = {
+        "typ": "widget",
+        "bot": bot_id,
+        "host": hostname,
+        "did": domain_id,
+        "iat": issued_at,
+        "exp": expires_at,
+    }
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def decode_widget_token(token: str) -> dict:
+    """Returns the token claims, or None if the token is invalid, expired or not a widget token."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("typ") != "widget":
+        return None
+    return payload
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+def _hash_semaphore() -> asyncio.Semaphore:
+    # One semaphore per event loop (tests and multiple loops each get their own)
+    loop = asyncio.get_running_loop()
+    if loop not in _hash_slots:
+        _hash_slots[loop] = asyncio.Semaphore(settings.PASSWORD_HASH_CONCURRENCY)
+    return _hash_slots[loop]
+
+async def _run_hashing(func, *args):
+    async with _hash_semaphore():
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bounded hashing pool, off the event loop."""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the bounded hashing pool, off the event loop."""
+    return await _run_hashing(get_password_hash, password)
@@ -0,0 +1,33 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from app.core.config import settings
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def process_pool_size() -> int:
+    return settings.INGESTION_WORKERS or os.cpu_count() or 1
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Returns the shared process pool for CPU-bound ingestion work (parsing, tokenizing).
+    Uses the spawn start method: forking a process that runs uvicorn's threads is unsafe.
+    """
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=process_pool_size(),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _process_pool
+
+def shutdown_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=True, cancel_futures=True)
+            _process_pool = None
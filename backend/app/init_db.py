@@ -1,9 +1,9 @@
-from app.core.database import engine, SessionLocal
-from app.models import Base, User, Domain, Metric
+from app.core.database import SessionLocal, init_models
+from app.models import User, Domain, Metric
 from app.core.security import get_password_hash
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    init_models()
     db = SessionLocal()
     
     # Check if admin user exists
@@ -1,12 +1,81 @@
+from contextlib import asynccontextmanager, suppress
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
-from app.api import endpoints, auth
+from app.core.database import init_models
+from app.core.workers import shutdown_process_pool
+from app.api import endpoints, auth, widget, archive, admin
+from app.services.ingestion import get_ingestion_service
+from app.services.vector_store import get_vector_store, close_vector_store
+from app.services.llm import get_llm, warm_up_llm
+from app.services.retention import retention_service
+from app.services.embedding_migration import embedding_migration_service
+from app.services.vector_index import vector_index_service
+from app.services import analytics
+from app.services.chat_persistence import chat_writes
+
+def warm_up():
+    """Preloads the chat and embedding models in Ollama and primes the Chroma collection."""
+    warm_up_llm()
+    get_vector_store().warm_up()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Services are built here rather than at import time; uvicorn only starts
+    # accepting connections once this startup block has finished.
+    app.state.ready = False
+    app.state.warmup = "skipped"
+
+    await run_in_threadpool(init_models)
+    await run_in_threadpool(analytics.backfill_on_startup)
+    await run_in_threadpool(get_vector_store)
+    await run_in_threadpool(analytics.backfill_documents_on_startup, get_vector_store())
+    await run_in_threadpool(get_ingestion_service)
+    await run_in_threadpool(get_llm)
+
+    if settings.WARMUP_ON_STARTUP:
+        try:
+            await run_in_threadpool(warm_up)
+            app.state.warmup = "ok"
+        except Exception as e:
+            print(f"Warm-up failed: {e}")
+            app.state.warmup = "failed"
+
+    # Re-embedding jobs and index rebuilds interrupted by a restart carry on in the background
+    await run_in_threadpool(embedding_migration_service.resume_pending)
+    await run_in_threadpool(vector_index_service.resume_pending)
+
+    chat_writes.start()
+
+    retention_task = None
+    if settings.RETENTION_ENABLED:
+        retention_task = asyncio.create_task(retention_service.run_periodically())
+
+    app.state.ready = True
+    yield
+    app.state.ready = False
+
+    if retention_task:
+        retention_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await retention_task
+    try:
+        # Queued chat writes are committed before the worker exits
+        await run_in_threadpool(chat_writes.stop)
+    except Exception as e:
+        print(f"Could not write queued chats on shutdown, saved to {settings.CHAT_WRITE_DEAD_LETTER_FILE}: {e}")
+    finally:
+        close_vector_store()
+        shutdown_process_pool()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Set all CORS enabled origins
@@ -24,8 +93,27 @@ app.add_middleware(
 )
 
 app.include_router(endpoints.router, prefix=settings.API_V1_STR)
+app.include_router(widget.router, prefix=settings.API_V1_STR, tags=["widget"])
+app.include_router(archive.router, prefix=settings.API_V1_STR, tags=["archive"])
+app.include_router(admin.router, prefix=settings.API_V1_STR, tags=["admin"])
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
 
 @app.get("/health")
 def health_check():
     return {"status": "ok", "version": settings.VERSION}
+
+@app.get("/ready")
+def readiness_check():
+    """
+    Reports whether this worker has finished startup and can reach the vector store.
+    Unlike /health, this returns 503 until the services are built.
+    """
+    if not getattr(app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+
+    try:
+        get_vector_store().heartbeat()
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "detail": f"Vector store: {str(e)}"})
+
+    return {"status": "ready", "warmup": app.state.warmup}
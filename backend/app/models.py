@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Date, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .core.database import Base
@@ -28,6 +28,7 @@ class Domain(Base):
     owner = relationship("User", back_populates="domains")
     metrics = relationship("Metric", back_populates="domain")
     chat_sessions = relationship("ChatSession", back_populates="domain")
+    retention_policy = relationship("RetentionPolicy", back_populates="domain", uselist=False)
 
 class Metric(Base):
     __tablename__ = "metrics"
@@ -45,8 +46,8 @@ class ChatSession(Base):
 
     id = Column(String, primary_key=True, index=True) # UUID
     user_email = Column(String, index=True, nullable=True)
-    domain_id = Column(Integer, ForeignKey("domains.id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    domain_id = Column(Integer, ForeignKey("domains.id"), index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     domain = relationship("Domain", back_populates="chat_sessions")
     messages = relationship("ChatMessage", back_populates="session", lazy="joined", order_by="ChatMessage.id")
@@ -55,9 +56,110 @@ class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String, ForeignKey("chat_sessions.id"))
+    session_id = Column(String, ForeignKey("chat_sessions.id"), index=True)
     role = Column(String) # user or assistant
     content = Column(String)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
 
     session = relationship("ChatSession", back_populates="messages")
+
+class ChatSessionMerge(Base):
+    """
+    An anonymous session merged into the email-identified session of the same visitor. Chat
+    messages still queued for it in another worker are moved to `merged_into` when written.
+    """
+    __tablename__ = "chat_session_merges"
+
+    session_id = Column(String, primary_key=True)
+    merged_into = Column(String, ForeignKey("chat_sessions.id"), index=True, nullable=False)
+    merged_at = Column(DateTime, default=datetime.utcnow)
+
+class RetentionPolicy(Base):
+    __tablename__ = "retention_policies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    domain_id = Column(Integer, ForeignKey("domains.id"), unique=True, nullable=False)
+    retention_days = Column(Integer, nullable=False) # sessions idle longer than this are archived
+    enabled = Column(Boolean, default=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    domain = relationship("Domain", back_populates="retention_policy")
+
+class BotEmbeddingState(Base):
+    """
+    Which embedding model (and so which Chroma collection) serves each bot, plus the state
+    of a re-embedding migration to another model. Bots without a row use EMBEDDING_MODEL.
+    """
+    __tablename__ = "bot_embedding_states"
+
+    id = Column(Integer, primary_key=True, index=True)
+    bot_id = Column(String, unique=True, index=True, nullable=False)
+    active_model = Column(String, nullable=False) # reads go here
+    target_model = Column(String, nullable=True) # being built; receives writes too
+    previous_model = Column(String, nullable=True) # kept in sync after cutover so rollback is lossless
+    status = Column(String, default="active") # active, migrating, ready, failed, cancelled, rolled_back
+    progress_done = Column(Integer, default=0)
+    progress_total = Column(Integer, default=0)
+    auto_cutover = Column(Boolean, default=False)
+    error = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class VectorIndex(Base):
+    """
+    HNSW parameters of an embedding model's Chroma collection, and which physical collection
+    currently serves it. Models without a row use the CHROMA_HNSW_* defaults and
+    collection_name_for(model).
+    """
+    __tablename__ = "vector_indexes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    model = Column(String, unique=True, index=True, nullable=False)
+    collection_name = Column(String, nullable=True) # set once the index has been rebuilt into a new collection
+    shadow_collection = Column(String, nullable=True) # being rebuilt, or just replaced; receives writes too
+    space = Column(String, nullable=True)
+    max_neighbors = Column(Integer, nullable=True)
+    ef_construction = Column(Integer, nullable=True)
+    ef_search = Column(Integer, nullable=True)
+    status = Column(String, default="active") # active, rebuild_required, rebuilding, failed
+    error = Column(String, nullable=True)
+    last_rebuilt_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DomainDailyStats(Base):
+    """Per-domain, per-day analytics, incremented as chats and ingestions happen."""
+    __tablename__ = "domain_daily_stats"
+    __table_args__ = (UniqueConstraint("domain_id", "day", name="uq_domain_daily_stats_domain_day"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    domain_id = Column(Integer, ForeignKey("domains.id"), nullable=False)
+    day = Column(Date, nullable=False, index=True)
+    chats = Column(Integer, default=0) # questions answered
+    sessions = Column(Integer, default=0) # distinct sessions that chatted that day
+    leads = Column(Integer, default=0) # sessions that left an email that day
+    unanswered = Column(Integer, default=0) # answers given without any retrieved source
+    sources_added = Column(Integer, default=0)
+
+class DomainDocument(Base):
+    """
+    The sources a domain's bot has been trained on, kept next to their chunks in Chroma so
+    listing them doesn't have to read every chunk's metadata.
+    """
+    __tablename__ = "domain_documents"
+    __table_args__ = (UniqueConstraint("domain_id", "source", name="uq_domain_documents_domain_source"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    domain_id = Column(Integer, ForeignKey("domains.id"), nullable=False)
+    source = Column(String, nullable=False)
+    type = Column(String, default="unknown")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class DomainSourceStats(Base):
+    """How often each source was cited in answers, per domain and day."""
+    __tablename__ = "domain_source_stats"
+    __table_args__ = (UniqueConstraint("domain_id", "day", "source", name="uq_domain_source_stats_domain_day_source"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    domain_id = Column(Integer, ForeignKey("domains.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    source = Column(String, nullable=False)
+    citations = Column(Integer, default=0)
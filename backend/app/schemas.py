@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime
 import uuid
-from typing import List, Optional
-from pydantic import BaseModel, EmailStr, HttpUrl
+from typing import List, Literal, Optional
+from pydantic import BaseModel, EmailStr, Field, HttpUrl
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -106,3 +106,111 @@ class ChatRequest(BaseModel):
     hostname: str
     sessionId: Optional[str] = None
     userEmail: Optional[EmailStr] = None
+    # Signed token from GET /widget/bootstrap; lets /chat skip the domain lookup
+    widgetToken: Optional[str] = None
+
+class RetentionPolicyUpdate(BaseModel):
+    retention_days: int
+    enabled: bool = True
+
+class RetentionPolicy(RetentionPolicyUpdate):
+    domain_id: int
+    is_default: bool = False
+
+class ArchivedMessage(BaseModel):
+    role: str
+    content: str
+    timestamp: Optional[datetime] = None
+
+class ArchivedSession(BaseModel):
+    id: str
+    domain_id: int
+    user_email: Optional[str] = None
+    created_at: Optional[datetime] = None
+    last_activity: Optional[datetime] = None
+    messages: List[ArchivedMessage] = []
+
+class EmbeddingMigrationCreate(BaseModel):
+    target_model: str
+    # Defaults to every bot
+    bot_ids: Optional[List[str]] = None
+    auto_cutover: bool = False
+
+class BotEmbeddingState(BaseModel):
+    bot_id: str
+    active_model: str
+    target_model: Optional[str] = None
+    previous_model: Optional[str] = None
+    status: str
+    progress_done: int = 0
+    progress_total: int = 0
+    auto_cutover: bool = False
+    error: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class VectorIndexConfig(BaseModel):
+    model: Optional[str] = None # defaults to EMBEDDING_MODEL
+    space: Optional[Literal["l2", "cosine", "ip"]] = None
+    max_neighbors: Optional[int] = Field(None, ge=2, le=256)
+    ef_construction: Optional[int] = Field(None, ge=1, le=10000)
+    ef_search: Optional[int] = Field(None, ge=1, le=10000)
+
+class VectorIndexRebuild(BaseModel):
+    model: Optional[str] = None
+
+class VectorIndexState(BaseModel):
+    model: str
+    collection_name: Optional[str] = None
+    shadow_collection: Optional[str] = None
+    space: Optional[str] = None
+    max_neighbors: Optional[int] = None
+    ef_construction: Optional[int] = None
+    ef_search: Optional[int] = None
+    status: str
+    error: Optional[str] = None
+    last_rebuilt_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class DailyStats(BaseModel):
+    day: date
+    chats: int = 0
+    sessions: int = 0
+    leads: int = 0
+    unanswered: int = 0
+    sources_added: int = 0
+
+class SourceCitations(BaseModel):
+    source: str
+    citations: int
+
+class DomainAnalytics(BaseModel):
+    # Totals over the requested window
+    chats: int = 0
+    sessions: int = 0
+    leads: int = 0
+    unanswered: int = 0
+    sources_added: int = 0
+    daily: List[DailyStats] = []
+    top_sources: List[SourceCitations] = []
+
+class DocumentSource(BaseModel):
+    source: str
+    type: str
+
+class DomainSummary(Domain):
+    metrics: MetricBase
+    analytics: DomainAnalytics
+    leads_total: int = 0
+    # Most recent leads only; see leads_total for the full count
+    leads: List[ChatSession] = []
+    documents: List[DocumentSource] = []
+
+class DashboardSummary(BaseModel):
+    days: int
+    domains: List[DomainSummary]
@@ -0,0 +1,306 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import noload
+from app import models
+from app.core.database import SessionLocal
+
+DAILY_COUNTERS = ("chats", "sessions", "leads", "unanswered", "sources_added")
+
+
+def _today() -> date:
+    return datetime.utcnow().date()
+
+
+def _as_date(value) -> date:
+    # func.date() returns a string on SQLite and a date elsewhere
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _increment(db, model, keys: dict, counts: dict):
+    """
+    Adds `counts` to the row identified by `keys`, creating it if needed, in one statement
+    on SQLite/PostgreSQL so concurrent workers never lose an increment.
+    """
+    counts = {column: value for column, value in counts.items() if value}
+    if not counts:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        table = model.__table__
+        stmt = insert(table).values(**keys, **counts)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + stmt.excluded[column] for column in counts}
+        )
+        db.execute(stmt)
+        return
+
+    row = db.query(model).filter_by(**keys).with_for_update().first()
+    if row is None:
+        db.add(model(**keys, **counts))
+    else:
+        for column, value in counts.items():
+            setattr(row, column, (getattr(row, column) or 0) + value)
+
+
+def chat_increments(domain_id: int, sources, first_today: bool, new_lead: bool, day: date = None):
+    """The rollup increments for one answered question, as (model, keys, counts) tuples."""
+    day = day or _today()
+    increments = [(models.DomainDailyStats, {"domain_id": domain_id, "day": day}, {
+        "chats": 1,
+        "sessions": int(first_today),
+        "leads": int(new_lead),
+        "unanswered": int(not sources),
+    })]
+    for source in sources:
+        increments.append((models.DomainSourceStats, {"domain_id": domain_id, "day": day, "source": source}, {"citations": 1}))
+    return increments
+
+
+def apply_increments(db, increments):
+    """Applies (model, keys, counts) increments, merging those that hit the same row first."""
+    merged = {}
+    for model, keys, counts in increments:
+        key = (model, tuple(sorted(keys.items())))
+        totals = merged.setdefault(key, {})
+        for column, value in counts.items():
+            totals[column] = totals.get(column, 0) + value
+    for (model, keys), counts in merged.items():
+        _increment(db, model, dict(keys), counts)
+
+
+def record_sources_added(db, domain_id: int, count: int = 1, day: date = None):
+    _increment(db, models.DomainDailyStats, {"domain_id": domain_id, "day": day or _today()}, {"sources_added": count})
+
+
+def record_documents(db, domain_id: int, documents):
+    """Registers (source, type) pairs as trained documents of a domain; known sources are kept."""
+    rows = [{"domain_id": domain_id, "source": source, "type": doc_type or "unknown", "created_at": datetime.utcnow()}
+            for source, doc_type in dict(documents).items()]
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        db.execute(insert(models.DomainDocument).on_conflict_do_nothing(index_elements=["domain_id", "source"]), rows)
+        return
+    known = {source for (source,) in db.query(models.DomainDocument.source).filter(
+        models.DomainDocument.domain_id == domain_id,
+        models.DomainDocument.source.in_([row["source"] for row in rows])
+    )}
+    db.add_all(models.DomainDocument(**row) for row in rows if row["source"] not in known)
+
+
+def remove_document(db, domain_id: int, source: str):
+    db.query(models.DomainDocument).filter(
+        models.DomainDocument.domain_id == domain_id,
+        models.DomainDocument.source == source
+    ).delete(synchronize_session=False)
+
+
+def backfill_documents(db, vector_store) -> int:
+    """
+    Fills domain_documents from the chunks in Chroma the first time it is used (one full
+    metadata scan). Does nothing if any row exists. Returns the number of rows written.
+    """
+    if db.query(models.DomainDocument.id).first() is not None:
+        return 0
+    domains = db.query(models.Domain.id, models.Domain.bot_id).all()
+    if not domains:
+        return 0
+    documents = vector_store.list_documents_by_bot(list({bot_id for _, bot_id in domains}))
+    written = 0
+    for domain_id, bot_id in domains:
+        pairs = [(document["source"], document["type"]) for document in documents.get(bot_id, [])]
+        record_documents(db, domain_id, pairs)
+        written += len(pairs)
+    db.commit()
+    return written
+
+
+def backfill_documents_on_startup(vector_store):
+    db = SessionLocal()
+    try:
+        written = backfill_documents(db, vector_store)
+        if written:
+            print(f"Backfilled {written} trained documents from the vector store")
+    finally:
+        db.close()
+
+
+def backfill(db) -> int:
+    """
+    Fills the daily rollups from existing chat history the first time they are used.
+    Citations and source counts were never stored, so only chats, sessions and leads are
+    recovered. Does nothing if any rollup row exists. Returns the number of rows written.
+    """
+    if db.query(models.DomainDailyStats.id).first() is not None:
+        return 0
+
+    rows = defaultdict(lambda: dict.fromkeys(DAILY_COUNTERS, 0))
+    message_day = func.date(models.ChatMessage.timestamp)
+    for domain_id, day, chats, sessions in db.query(
+        models.ChatSession.domain_id,
+        message_day,
+        func.count(models.ChatMessage.id),
+        func.count(func.distinct(models.ChatMessage.session_id))
+    ).join(models.ChatSession, models.ChatSession.id == models.ChatMessage.session_id).filter(
+        models.ChatMessage.role == "user",
+        models.ChatMessage.timestamp.isnot(None)
+    ).group_by(models.ChatSession.domain_id, message_day):
+        rows[(domain_id, _as_date(day))].update(chats=chats, sessions=sessions)
+
+    session_day = func.date(models.ChatSession.created_at)
+    for domain_id, day, leads in db.query(
+        models.ChatSession.domain_id, session_day, func.count(models.ChatSession.id)
+    ).filter(
+        models.ChatSession.user_email.isnot(None),
+        models.ChatSession.created_at.isnot(None)
+    ).group_by(models.ChatSession.domain_id, session_day):
+        rows[(domain_id, _as_date(day))]["leads"] = leads
+
+    if not rows:
+        return 0
+    db.add_all(models.DomainDailyStats(domain_id=domain_id, day=day, **counts) for (domain_id, day), counts in rows.items())
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker backfilled at the same time
+        db.rollback()
+        return 0
+    return len(rows)
+
+
+def backfill_on_startup():
+    db = SessionLocal()
+    try:
+        written = backfill(db)
+        if written:
+            print(f"Backfilled {written} daily analytics rows from chat history")
+    finally:
+        db.close()
+
+
+def dashboard_summary(db, principal, days: int = 30, leads_limit: int = 50, top_sources: int = 10):
+    """
+    Everything the dashboard shows for all of a user's domains, in a fixed number of
+    queries regardless of how many domains there are.
+    """
+    def scoped(query, column):
+        return query if principal.is_superuser else query.filter(column.in_(principal.domain_ids))
+
+    start = _today() - timedelta(days=days - 1)
+
+    domains = scoped(db.query(models.Domain), models.Domain.id).order_by(models.Domain.id).all()
+    summaries = {
+        domain.id: {
+            "id": domain.id,
+            "hostname": domain.hostname,
+            "bot_id": domain.bot_id,
+            "owner_id": domain.owner_id,
+            "created_at": domain.created_at,
+            "metrics": {"chats_count": 0, "sources_count": 0},
+            "analytics": {**dict.fromkeys(DAILY_COUNTERS, 0), "daily": [], "top_sources": []},
+            "leads_total": 0,
+            "leads": [],
+            "documents": [],
+        }
+        for domain in domains
+    }
+    if not summaries:
+        return {"days": days, "domains": []}
+
+    for metric in scoped(db.query(models.Metric), models.Metric.domain_id):
+        if metric.domain_id in summaries:
+            summaries[metric.domain_id]["metrics"] = {"chats_count": metric.chats_count or 0, "sources_count": metric.sources_count or 0}
+
+    for stats in scoped(db.query(models.DomainDailyStats), models.DomainDailyStats.domain_id).filter(
+        models.DomainDailyStats.day >= start
+    ).order_by(models.DomainDailyStats.day):
+        if stats.domain_id not in summaries:
+            continue
+        analytics = summaries[stats.domain_id]["analytics"]
+        daily = {counter: getattr(stats, counter) or 0 for counter in DAILY_COUNTERS}
+        for counter, value in daily.items():
+            analytics[counter] += value
+        analytics["daily"].append({"day": stats.day, **daily})
+
+    # The daily rows count distinct sessions per day; over the window a session counts once
+    window_sessions = scoped(db.query(
+        models.ChatSession.domain_id, func.count(func.distinct(models.ChatMessage.session_id))
+    ), models.ChatSession.domain_id).join(
+        models.ChatMessage, models.ChatMessage.session_id == models.ChatSession.id
+    ).filter(
+        models.ChatMessage.role == "user",
+        models.ChatMessage.timestamp >= datetime.combine(start, datetime.min.time())
+    ).group_by(models.ChatSession.domain_id)
+    for domain_id, sessions in window_sessions:
+        if domain_id in summaries:
+            summaries[domain_id]["analytics"]["sessions"] = sessions
+
+    citations = func.sum(models.DomainSourceStats.citations)
+    ranked = scoped(db.query(
+        models.DomainSourceStats.domain_id,
+        models.DomainSourceStats.source,
+        citations.label("citations"),
+        func.row_number().over(partition_by=models.DomainSourceStats.domain_id, order_by=citations.desc()).label("rank")
+    ), models.DomainSourceStats.domain_id).filter(
+        models.DomainSourceStats.day >= start
+    ).group_by(models.DomainSourceStats.domain_id, models.DomainSourceStats.source).subquery()
+    for row in db.query(ranked).filter(ranked.c.rank <= top_sources).order_by(ranked.c.domain_id, ranked.c.rank):
+        if row.domain_id in summaries:
+            summaries[row.domain_id]["analytics"]["top_sources"].append({"source": row.source, "citations": row.citations})
+
+    has_email = models.ChatSession.user_email.isnot(None)
+    for domain_id, total in scoped(
+        db.query(models.ChatSession.domain_id, func.count(models.ChatSession.id)), models.ChatSession.domain_id
+    ).filter(has_email).group_by(models.ChatSession.domain_id):
+        if domain_id in summaries:
+            summaries[domain_id]["leads_total"] = total
+
+    recent = scoped(db.query(
+        models.ChatSession.id,
+        func.row_number().over(partition_by=models.ChatSession.domain_id, order_by=models.ChatSession.created_at.desc()).label("rank")
+    ), models.ChatSession.domain_id).filter(has_email).subquery()
+    # Messages are loaded below in one query for all leads, not joined in per session
+    leads = db.query(models.ChatSession).options(noload(models.ChatSession.messages)).join(recent, recent.c.id == models.ChatSession.id).filter(
+        recent.c.rank <= leads_limit
+    ).order_by(models.ChatSession.created_at.desc()).all()
+
+    messages = defaultdict(list)
+    if leads:
+        for message in db.query(models.ChatMessage).filter(
+            models.ChatMessage.session_id.in_([lead.id for lead in leads])
+        ).order_by(models.ChatMessage.id):
+            messages[message.session_id].append({
+                "id": message.id,
+                "session_id": message.session_id,
+                "role": message.role,
+                "content": message.content,
+                "timestamp": message.timestamp,
+            })
+    for lead in leads:
+        if lead.domain_id in summaries:
+            summaries[lead.domain_id]["leads"].append({
+                "id": lead.id,
+                "user_email": lead.user_email,
+                "domain_id": lead.domain_id,
+                "created_at": lead.created_at,
+                "messages": messages[lead.id],
+            })
+
+    for document in scoped(db.query(models.DomainDocument), models.DomainDocument.domain_id).order_by(models.DomainDocument.id):
+        if document.domain_id in summaries:
+            summaries[document.domain_id]["documents"].append({"source": document.source, "type": document.type})
+
+    return {"days": days, "domains": list(summaries.values())}
@@ -0,0 +1,266 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import insert, select
+from app import models
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services import analytics
+
+
+def insert_session(db, session_id: str, domain_id: int, user_email: str = None) -> bool:
+    """
+    Inserts a chat session unless one with this id exists (another worker may be creating the
+    same client-supplied id). Returns True if this call created it. The caller commits.
+    """
+    row = {"id": session_id, "domain_id": domain_id, "user_email": user_email, "created_at": datetime.utcnow()}
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        if db.query(models.ChatSession.id).filter(models.ChatSession.id == session_id).first():
+            return False
+        db.execute(insert(models.ChatSession), [row])
+        return True
+    result = db.execute(dialect_insert(models.ChatSession).values(**row).on_conflict_do_nothing(index_elements=["id"]))
+    return result.rowcount == 1
+
+
+def merge_session(db, session_id: str, into: str):
+    """
+    Moves a session's messages to `into` and deletes it, remembering the merge so messages
+    another worker writes for it later follow (see ChatWriteQueue._write). The caller commits.
+    """
+    db.query(models.ChatSessionMerge).filter(models.ChatSessionMerge.merged_into == session_id).update(
+        {models.ChatSessionMerge.merged_into: into}, synchronize_session=False
+    )
+    db.merge(models.ChatSessionMerge(session_id=session_id, merged_into=into, merged_at=datetime.utcnow()))
+    db.flush()
+    db.query(models.ChatMessage).filter(models.ChatMessage.session_id == session_id).update(
+        {models.ChatMessage.session_id: into}, synchronize_session=False
+    )
+    db.query(models.ChatSession).filter(models.ChatSession.id == session_id).delete(synchronize_session=False)
+
+
+class ChatWriteQueue:
+    """
+    Write-behind queue for /chat. Messages, chat counters and analytics increments are
+    appended here and written by one background thread in a single transaction of bulk
+    INSERTs every CHAT_WRITE_FLUSH_MS (or CHAT_WRITE_BATCH_ROWS rows), instead of one
+    fsync'd transaction per chat. Sessions are not queued: /chat inserts them directly so
+    every worker sees them.
+
+    A batch that fails CHAT_WRITE_MAX_RETRIES times in a row is appended to
+    CHAT_WRITE_DEAD_LETTER_FILE and dropped, so one bad row can't stall later writes. Once
+    CHAT_WRITE_QUEUE_LIMIT rows are queued, or after stop(), add_chat() refuses and the
+    caller writes synchronously with write_now(). stop() drains the queue on shutdown; a
+    hard crash can lose at most the last flush interval.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._failures = 0
+
+        # Queued, not yet picked up by a flush
+        self._messages = []
+        self._chats = Counter()
+        self._increments = []
+        # Messages per session, queued or in the flush in progress
+        self._inflight_message_counts = Counter()
+        self._message_counts = Counter()
+
+    def start(self):
+        with self._lock:
+            self._stopping = False
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops the writer and synchronously writes everything still queued. If that fails,
+        the remaining rows go to the dead-letter file and the error is re-raised.
+        """
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+            thread = self._thread
+        if thread:
+            thread.join()
+        try:
+            self.flush()
+        except Exception as e:
+            with self._lock:
+                messages, chats, increments = self._messages, self._chats, self._increments
+                self._messages, self._chats, self._increments = [], Counter(), []
+                self._message_counts = Counter()
+            self._dead_letter(messages, chats, increments, e)
+            raise
+
+    def _queued_rows(self) -> int:
+        return len(self._messages) + len(self._increments)
+
+    # Writes
+
+    def add_chat(self, session_id: str, domain_id: int, question: str, asked_at, answer: str, answered_at, increments=()) -> bool:
+        """
+        Queues the user and assistant messages of one exchange plus its counters. Returns False,
+        queuing nothing, if the queue is full or stopped; write them with write_now() then.
+        """
+        with self._lock:
+            if self._stopping or self._queued_rows() >= settings.CHAT_WRITE_QUEUE_LIMIT:
+                return False
+            self._messages.extend(_exchange(session_id, question, asked_at, answer, answered_at))
+            self._message_counts[session_id] += 2
+            self._chats[domain_id] += 1
+            self._increments.extend(increments)
+            self._wakeup.notify()
+        self._ensure_running()
+        return True
+
+    def write_now(self, session_id: str, domain_id: int, question: str, asked_at, answer: str, answered_at, increments=()):
+        """Writes one exchange in its own transaction, bypassing the queue."""
+        self._write(_exchange(session_id, question, asked_at, answer, answered_at), Counter({domain_id: 1}), list(increments))
+
+    # Read-your-writes
+
+    def has_pending_messages(self, session_id: str) -> bool:
+        with self._lock:
+            return self._message_counts[session_id] > 0 or self._inflight_message_counts[session_id] > 0
+
+    # Flushing
+
+    def _ensure_running(self):
+        if self._stopping:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+
+    def _run(self):
+        interval = settings.CHAT_WRITE_FLUSH_MS / 1000
+        while True:
+            with self._lock:
+                if not self._queued_rows() and not self._chats and not self._stopping:
+                    self._wakeup.wait()
+                if self._stopping:
+                    return
+            # Let a batch build up, unless it is already full
+            deadline = time.monotonic() + interval
+            with self._lock:
+                while not self._stopping and self._queued_rows() < settings.CHAT_WRITE_BATCH_ROWS:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Chat write-behind flush failed ({self._failures}/{settings.CHAT_WRITE_MAX_RETRIES}), retrying: {e}")
+                time.sleep(max(interval, 0.5))
+
+    def _write(self, messages, chats, increments):
+        db = SessionLocal()
+        try:
+            if messages:
+                db.execute(insert(models.ChatMessage), messages)
+                # Messages of a session merged away since they were queued (possibly by another
+                # worker) go to the session it was merged into
+                merges = models.ChatSessionMerge
+                db.query(models.ChatMessage).filter(
+                    models.ChatMessage.session_id.in_({message["session_id"] for message in messages}),
+                    models.ChatMessage.session_id.in_(select(merges.session_id))
+                ).update({
+                    models.ChatMessage.session_id: select(merges.merged_into).where(
+                        merges.session_id == models.ChatMessage.session_id
+                    ).scalar_subquery()
+                }, synchronize_session=False)
+            for domain_id, count in chats.items():
+                db.query(models.Metric).filter(models.Metric.domain_id == domain_id).update(
+                    {models.Metric.chats_count: models.Metric.chats_count + count}, synchronize_session=False
+                )
+            analytics.apply_increments(db, increments)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def flush(self):
+        """Writes everything queued so far in one transaction. Returns once it is committed."""
+        with self._flush_lock:
+            with self._lock:
+                messages, chats, increments = self._messages, self._chats, self._increments
+                if not (messages or chats or increments):
+                    return
+                self._messages, self._chats, self._increments = [], Counter(), []
+                self._inflight_message_counts = self._message_counts
+                self._message_counts = Counter()
+
+            try:
+                self._write(messages, chats, increments)
+            except Exception as e:
+                self._failures += 1
+                if self._failures >= settings.CHAT_WRITE_MAX_RETRIES:
+                    # Give up on this batch so the rows queued behind it can be written
+                    self._failures = 0
+                    self._dead_letter(messages, chats, increments, e)
+                    with self._lock:
+                        self._inflight_message_counts = Counter()
+                    return
+                # Put the batch back in front of anything queued meanwhile and let the caller retry
+                with self._lock:
+                    self._messages = messages + self._messages
+                    self._chats = chats + self._chats
+                    self._increments = increments + self._increments
+                    self._message_counts = self._inflight_message_counts + self._message_counts
+                    self._inflight_message_counts = Counter()
+                raise
+
+            self._failures = 0
+            with self._lock:
+                self._inflight_message_counts = Counter()
+
+    def _dead_letter(self, messages, chats, increments, error: Exception):
+        """Appends a batch that could not be written to the dead-letter file, for manual replay."""
+        if not (messages or chats or increments):
+            return
+        record = {
+            "failed_at": datetime.utcnow().isoformat(),
+            "error": str(error),
+            "messages": messages,
+            "chats": dict(chats),
+            "increments": [
+                {"table": model.__tablename__, "keys": keys, "counts": counts}
+                for model, keys, counts in increments
+            ],
+        }
+        print(f"Chat write-behind dropped a batch of {len(messages)} messages, see {settings.CHAT_WRITE_DEAD_LETTER_FILE}: {error}")
+        try:
+            directory = os.path.dirname(settings.CHAT_WRITE_DEAD_LETTER_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(settings.CHAT_WRITE_DEAD_LETTER_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Could not write the chat dead-letter file, batch lost: {e}; {json.dumps(record, default=str)}")
+
+
+def _exchange(session_id: str, question: str, asked_at, answer: str, answered_at):
+    return [
+        {"session_id": session_id, "role": "user", "content": question, "timestamp": asked_at},
+        {"session_id": session_id, "role": "assistant", "content": answer, "timestamp": answered_at},
+    ]
+
+
+chat_writes = ChatWriteQueue()
@@ -0,0 +1,181 @@
+import asyncio
+import re
+from app.core.config import settings
+from app.core.workers import get_process_pool, process_pool_size
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+_encodings = {}
+
+
+class ApproximateEncoding:
+    """
+    Offline stand-in for a tiktoken encoding (~1 token per short word or punctuation mark).
+    Used when the BPE file can't be downloaded; decode(encode(text)) returns the text.
+    """
+    PIECE_RE = re.compile(r"\s*(?:\w{1,6}|[^\w\s])|\s+$")
+
+    def encode(self, text: str, **kwargs):
+        return self.PIECE_RE.findall(text)
+
+    def decode(self, pieces) -> str:
+        return "".join(pieces)
+
+
+def _get_encoding(name: str):
+    # tiktoken encodings are expensive to build; keep one per process
+    if name not in _encodings:
+        try:
+            import tiktoken
+            _encodings[name] = tiktoken.get_encoding(name)
+        except Exception as e:
+            print(f"Tokenizer '{name}' unavailable ({e}); falling back to approximate token counts")
+            _encodings[name] = ApproximateEncoding()
+    return _encodings[name]
+
+
+class TokenChunker:
+    """
+    Splits text into chunks of at most `chunk_tokens` tokens, cutting only at heading and
+    paragraph boundaries (then sentences) so a chunk never starts mid-thought.
+    Overlap is only added when a single block is too long and has to be cut by tokens.
+    """
+
+    def __init__(self, chunk_tokens: int = None, overlap_tokens: int = None, encoding_name: str = "cl100k_base"):
+        self.chunk_tokens = chunk_tokens or settings.CHUNK_TOKENS
+        self.overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        self.encoding_name = encoding_name
+
+    @property
+    def encoding(self):
+        return _get_encoding(self.encoding_name)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def _blocks(self, text: str):
+        """Yields (section, block, is_heading); headings start a new section and stay in the text."""
+        path = []
+        for block in re.split(r"\n\s*\n", text):
+            block = block.strip()
+            if not block:
+                continue
+            match = HEADING_RE.match(block.split("\n", 1)[0])
+            if match:
+                level = len(match.group(1))
+                path = path[:level - 1] + [match.group(2).strip()]
+            yield " > ".join(path), block, bool(match)
+
+    def _split_long_block(self, block: str):
+        """Packs sentences, falling back to token windows with overlap for run-on text."""
+        pieces = []
+        current, current_tokens = [], 0
+        for sentence in SENTENCE_RE.split(block):
+            tokens = self.count_tokens(sentence)
+            if tokens > self.chunk_tokens:
+                if current:
+                    pieces.append(" ".join(current))
+                    current, current_tokens = [], 0
+                ids = self.encoding.encode(sentence, disallowed_special=())
+                step = max(1, self.chunk_tokens - self.overlap_tokens)
+                for start in range(0, len(ids), step):
+                    pieces.append(self.encoding.decode(ids[start:start + self.chunk_tokens]))
+                    if start + self.chunk_tokens >= len(ids):
+                        break
+                continue
+            if current and current_tokens + tokens > self.chunk_tokens:
+                pieces.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(sentence)
+            current_tokens += tokens + 1
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
+    def split_text(self, text: str):
+        """Returns a list of (chunk_text, section) tuples."""
+        chunks = []
+        current, current_tokens, current_section = [], 0, ""
+
+        def flush():
+            nonlocal current, current_tokens
+            if current:
+                chunks.append(("\n\n".join(current), current_section))
+            current, current_tokens = [], 0
+
+        for section, block, is_heading in self._blocks(text):
+            tokens = self.count_tokens(block)
+            # Prefer to start a new chunk at a heading once the current one is reasonably full
+            if is_heading and current_tokens >= self.chunk_tokens // 2:
+                flush()
+            if tokens > self.chunk_tokens:
+                flush()
+                for piece in self._split_long_block(block):
+                    chunks.append((piece, section))
+                continue
+            if current and current_tokens + tokens > self.chunk_tokens:
+                flush()
+            # Label the chunk with the innermost section it reaches (its last heading's path)
+            current_section = section
+            current.append(block)
+            current_tokens += tokens + 2
+        flush()
+        return chunks
+
+    def split_items(self, items):
+        """Splits (text, metadata) pairs into (chunk_text, metadata) pairs."""
+        out = []
+        for text, metadata in items:
+            for chunk, section in self.split_text(text):
+                chunk_metadata = dict(metadata)
+                if section:
+                    chunk_metadata["section"] = section
+                out.append((chunk, chunk_metadata))
+        return out
+
+    def split_documents(self, documents):
+        from langchain.docstore.document import Document
+
+        items = [(doc.page_content, doc.metadata) for doc in documents]
+        return [Document(page_content=text, metadata=metadata) for text, metadata in self.split_items(items)]
+
+    async def asplit_documents(self, documents):
+        """
+        Like split_documents, but large inputs are spread across the ingestion process pool
+        so tokenizing a big corpus doesn't block the event loop or a single core.
+        """
+        from langchain.docstore.document import Document
+
+        items = [(doc.page_content, doc.metadata) for doc in documents]
+        total_chars = sum(len(text) for text, _ in items)
+        if total_chars < settings.CHUNK_PARALLEL_MIN_CHARS:
+            split = self.split_items(items)
+        else:
+            loop = asyncio.get_running_loop()
+            pool = get_process_pool()
+            batches = _batch_by_size(items, max(1, total_chars // (process_pool_size() * 4)))
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, _split_batch, batch, self.chunk_tokens, self.overlap_tokens, self.encoding_name)
+                for batch in batches
+            ))
+            split = [pair for result in results for pair in result]
+        return [Document(page_content=text, metadata=metadata) for text, metadata in split]
+
+
+def _batch_by_size(items, target_chars: int):
+    batches, current, size = [], [], 0
+    for item in items:
+        current.append(item)
+        size += len(item[0])
+        if size >= target_chars:
+            batches.append(current)
+            current, size = [], 0
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _split_batch(items, chunk_tokens: int, overlap_tokens: int, encoding_name: str):
+    """Process pool entry point."""
+    return TokenChunker(chunk_tokens, overlap_tokens, encoding_name).split_items(items)
@@ -0,0 +1,282 @@
+import os
+import threading
+import time
+from app import models
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.locks import acquire_exclusive_lock
+from app.services.vector_store import get_vector_store
+
+LOCK_FILE = ".reembed.lock"
+# How often a worker that lost the lock race checks whether migrations are still queued
+LOCK_RETRY_SECONDS = 5
+
+
+class EmbeddingMigrationService:
+    """
+    Moves bots from one embedding model to another without downtime.
+
+    Every model has its own Chroma collection. A migration re-embeds a bot's stored chunk
+    text (no sources are refetched) into the target model's collection in small throttled
+    batches, while reads keep going to the active model and new writes go to both. Cutover
+    is a single BotEmbeddingState row update per bot; after it the old collection is still
+    written to, so a rollback loses nothing until the migration is finalized.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def states(self, db):
+        return db.query(models.BotEmbeddingState).order_by(models.BotEmbeddingState.bot_id).all()
+
+    def _get_state(self, db, bot_id: str):
+        return db.query(models.BotEmbeddingState).filter(models.BotEmbeddingState.bot_id == bot_id).first()
+
+    def start(self, db, target_model: str, bot_ids=None, auto_cutover: bool = False):
+        """
+        Queues a migration to `target_model` for the given bots (all bots if None) and makes
+        sure the background job is running. Raises ValueError if a bot can't be migrated now.
+        """
+        if db.query(models.VectorIndex.id).filter(models.VectorIndex.status == "rebuilding").first():
+            raise ValueError("A vector index rebuild is running; start the migration once it has finished")
+        if bot_ids is None:
+            bot_ids = [bot_id for (bot_id,) in db.query(models.Domain.bot_id).distinct().all()]
+        else:
+            known = {bot_id for (bot_id,) in db.query(models.Domain.bot_id).filter(models.Domain.bot_id.in_(bot_ids)).all()}
+            unknown = sorted(set(bot_ids) - known)
+            if unknown:
+                raise ValueError(f"Unknown bots: {', '.join(unknown)}")
+
+        states = []
+        for bot_id in bot_ids:
+            state = self._get_state(db, bot_id)
+            if state is None:
+                state = models.BotEmbeddingState(bot_id=bot_id, active_model=settings.EMBEDDING_MODEL)
+                db.add(state)
+            elif state.status == "migrating":
+                raise ValueError(f"Bot {bot_id} is already migrating to {state.target_model}")
+            elif state.status == "ready":
+                raise ValueError(f"Bot {bot_id} has a built index for {state.target_model} waiting for cutover; cut over or roll back first")
+            elif state.previous_model:
+                raise ValueError(f"Bot {bot_id} has an unfinalized migration from {state.previous_model}")
+            if state.active_model == target_model:
+                continue
+            states.append(state)
+
+        for state in states:
+            state.target_model = target_model
+            state.status = "migrating"
+            state.progress_done = 0
+            state.progress_total = 0
+            state.auto_cutover = auto_cutover
+            state.error = None
+        db.commit()
+
+        get_vector_store().invalidate_state()
+        self.ensure_running()
+        return states
+
+    def ensure_running(self):
+        """Starts the background re-embedding thread in this worker if it isn't running."""
+        with self._thread_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="embedding-migration", daemon=True)
+            self._thread.start()
+
+    def resume_pending(self):
+        """Called on startup: picks up migrations interrupted by a restart."""
+        db = SessionLocal()
+        try:
+            pending = db.query(models.BotEmbeddingState.id).filter(models.BotEmbeddingState.status == "migrating").first()
+        finally:
+            db.close()
+        if pending:
+            self.ensure_running()
+
+    def _next_pending(self, db):
+        return db.query(models.BotEmbeddingState).filter(
+            models.BotEmbeddingState.status == "migrating"
+        ).order_by(models.BotEmbeddingState.id).first()
+
+    def _run(self):
+        # Only one process re-embeds at a time; the others wait until it is done or gone
+        os.makedirs(settings.CHROMA_PERSIST_DIRECTORY, exist_ok=True)
+        lock_path = os.path.join(settings.CHROMA_PERSIST_DIRECTORY, LOCK_FILE)
+        while True:
+            lock = acquire_exclusive_lock(lock_path)
+            if lock is not None:
+                break
+            time.sleep(LOCK_RETRY_SECONDS)
+            db = SessionLocal()
+            try:
+                if self._next_pending(db) is None:
+                    return
+            finally:
+                db.close()
+
+        try:
+            while True:
+                db = SessionLocal()
+                try:
+                    state = self._next_pending(db)
+                    if state is None:
+                        return
+                    try:
+                        self._migrate_bot(db, state)
+                    except Exception as e:
+                        db.rollback()
+                        print(f"Embedding migration failed for bot {state.bot_id}: {e}")
+                        self._failed(db, state, e)
+                finally:
+                    db.close()
+        finally:
+            lock.close()
+
+    def _copy(self, store, source_model: str, target_model: str, ids, state=None, db=None) -> bool:
+        """Re-embeds `ids` from the source collection into the target one. False if cancelled."""
+        source = store.collection_for(source_model)
+        target = store.collection_for(target_model)
+        embeddings = store.embeddings_for(target_model)
+        batch_size = settings.REEMBED_BATCH_SIZE
+
+        for i in range(0, len(ids), batch_size):
+            if state is not None:
+                db.refresh(state)
+                if state.status != "migrating" or state.target_model != target_model:
+                    return False
+
+            batch = source.get(ids=ids[i:i + batch_size], include=["documents", "metadatas"])
+            if batch["ids"]:
+                metadatas = [{**(m or {}), "embedding_model": target_model} for m in batch["metadatas"]]
+                target.upsert(
+                    ids=batch["ids"],
+                    documents=batch["documents"],
+                    metadatas=metadatas,
+                    embeddings=embeddings.embed_documents(batch["documents"])
+                )
+
+            if state is not None:
+                state.progress_done = min(state.progress_total, i + batch_size)
+                db.commit()
+            time.sleep(settings.REEMBED_PAUSE_SECONDS)
+        return True
+
+    def _migrate_bot(self, db, state):
+        store = get_vector_store()
+        source_model, target_model = state.active_model, state.target_model
+        where = {"botId": state.bot_id}
+        print(f"Re-embedding bot {state.bot_id}: {source_model} -> {target_model}")
+
+        ids = store.collection_for(source_model).get(where=where, include=[])["ids"]
+        state.progress_total = len(ids)
+        state.progress_done = 0
+        db.commit()
+
+        if not self._copy(store, source_model, target_model, ids, state, db):
+            self._cancelled(db, state, target_model)
+            return
+
+        # Workers pick up the dual-write assignment within EMBEDDING_STATE_CACHE_SECONDS; wait
+        # that out, then reconcile anything written or deleted only on the source meanwhile.
+        time.sleep(settings.EMBEDDING_STATE_CACHE_SECONDS)
+        source_ids = set(store.collection_for(source_model).get(where=where, include=[])["ids"])
+        target_ids = set(store.collection_for(target_model).get(where=where, include=[])["ids"])
+        if target_ids - source_ids:
+            store.collection_for(target_model).delete(ids=list(target_ids - source_ids))
+        if not self._copy(store, source_model, target_model, list(source_ids - target_ids)):
+            return
+
+        db.refresh(state)
+        if state.status != "migrating" or state.target_model != target_model:
+            self._cancelled(db, state, target_model)
+            return
+        state.progress_total = state.progress_done = len(source_ids)
+        if state.auto_cutover:
+            self._apply_cutover(state)
+        else:
+            state.status = "ready"
+        db.commit()
+        store.invalidate_state()
+        print(f"Re-embedding bot {state.bot_id} finished ({len(source_ids)} chunks, status {state.status})")
+
+    def _failed(self, db, state, error: Exception):
+        # Stop dual-writing into the half-built index and drop what was copied so far
+        target_model = state.target_model
+        state.status = "failed"
+        state.error = f"{target_model}: {error}"[:500]
+        state.target_model = None
+        db.commit()
+        get_vector_store().invalidate_state()
+        if target_model:
+            try:
+                self._cancelled(db, state, target_model)
+            except Exception as e:
+                print(f"Could not drop {target_model} vectors of bot {state.bot_id}: {e}")
+
+    def _cancelled(self, db, state, target_model: str):
+        # Rolled back mid-migration: drop what was built, unless the target became live after all
+        if state.active_model != target_model and state.previous_model != target_model:
+            self._drop_vectors(target_model, state.bot_id)
+
+    def _drop_vectors(self, model: str, bot_id: str):
+        get_vector_store().delete_vectors(model, {"botId": bot_id})
+
+    def _apply_cutover(self, state):
+        state.previous_model = state.active_model
+        state.active_model = state.target_model
+        state.target_model = None
+        state.status = "active"
+
+    def cutover(self, db, bot_id: str):
+        """Switches the bot's reads to the newly built index."""
+        state = self._get_state(db, bot_id)
+        if state is None or state.status != "ready":
+            raise ValueError("Bot has no completed migration to cut over to")
+        self._apply_cutover(state)
+        db.commit()
+        get_vector_store().invalidate_state()
+        return state
+
+    def rollback(self, db, bot_id: str):
+        """Cancels a migration in progress, or switches reads back to the previous model."""
+        state = self._get_state(db, bot_id)
+        if state is None:
+            raise ValueError("Bot has no migration to roll back")
+
+        if state.target_model:
+            abandoned = state.target_model
+            running = state.status == "migrating"
+            state.target_model = None
+            state.status = "cancelled"
+        elif state.previous_model:
+            abandoned = state.active_model
+            running = False
+            state.active_model = state.previous_model
+            state.previous_model = None
+            state.status = "rolled_back"
+        else:
+            raise ValueError("Bot has no migration to roll back")
+
+        db.commit()
+        get_vector_store().invalidate_state()
+        # A running job notices the cancellation at its next batch and cleans up after itself
+        if not running:
+            self._drop_vectors(abandoned, bot_id)
+        return state
+
+    def finalize(self, db, bot_id: str):
+        """Stops writing to the previous model and deletes the bot's old vectors."""
+        state = self._get_state(db, bot_id)
+        if state is None or not state.previous_model:
+            raise ValueError("Bot has no previous model to finalize")
+        previous = state.previous_model
+        state.previous_model = None
+        db.commit()
+        get_vector_store().invalidate_state()
+        self._drop_vectors(previous, bot_id)
+        return state
+
+
+embedding_migration_service = EmbeddingMigrationService()
@@ -0,0 +1,281 @@
+import io
+import os
+import re
+import zipfile
+from lxml import etree
+from lxml import html as lxml_html
+
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+TEXT_BLOCK_TAGS = {"p", "pre", "blockquote", "dt", "dd", "figcaption", "caption", "address"}
+LIST_TAGS = {"ul", "ol"}
+BOILERPLATE_TAGS = [
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object",
+    "form", "button", "select", "input", "nav", "header", "footer", "aside"
+]
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "dialog"}
+BOILERPLATE_MARKERS = {
+    "nav", "navbar", "menu", "breadcrumb", "breadcrumbs", "sidebar", "footer", "header",
+    "cookie", "cookies", "consent", "advert", "ads", "social", "share", "newsletter", "popup", "modal"
+}
+MARKER_SPLIT = re.compile(r"[\s_\-]+")
+
+FORMAT_BY_EXTENSION = {
+    ".pdf": "pdf",
+    ".txt": "text",
+    ".text": "text",
+    ".md": "markdown",
+    ".markdown": "markdown",
+    ".html": "html",
+    ".htm": "html",
+    ".docx": "docx",
+}
+FORMAT_BY_CONTENT_TYPE = {
+    "application/pdf": "pdf",
+    "text/plain": "text",
+    "text/markdown": "markdown",
+    "text/html": "html",
+    "application/xhtml+xml": "html",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+}
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MD_FRONT_MATTER_RE = re.compile(r"\A---\s*\n.*?\n---\s*\n", re.S)
+MD_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+MD_LINK_RE = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+MD_SETEXT_RE = re.compile(r"^(.+)\n(=+|-+)[ \t]*$", re.M)
+
+
+def _clean(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _looks_like_boilerplate(el) -> bool:
+    if el.get("role") in BOILERPLATE_ROLES or el.get("aria-hidden") == "true":
+        return True
+    markers = MARKER_SPLIT.split(f"{el.get('class', '')} {el.get('id', '')}".lower())
+    return any(marker in BOILERPLATE_MARKERS for marker in markers)
+
+
+def _strip_boilerplate(doc):
+    for el in list(doc.iter(*BOILERPLATE_TAGS)):
+        # <header> inside an article is usually its title block, keep it
+        if el.tag == "header" and el.xpath("ancestor::article|ancestor::main"):
+            continue
+        if el.getparent() is not None:
+            el.drop_tree()
+    for el in list(doc.iter()):
+        if not isinstance(el.tag, str) or el.tag in ("html", "body", "main", "article"):
+            continue
+        if el.getparent() is not None and _looks_like_boilerplate(el) and not el.xpath(".//main|.//article"):
+            el.drop_tree()
+
+
+def _content_root(doc):
+    for xpath in ("//main", "//article", "//*[@role='main']", "//body"):
+        found = doc.xpath(xpath)
+        if found:
+            return found[0]
+    return doc
+
+
+def _table_lines(table):
+    lines = []
+    for row in table.iter("tr"):
+        cells = [_clean(cell.text_content()) for cell in row if cell.tag in ("td", "th")]
+        if any(cells):
+            lines.append(" | ".join(cells))
+    return lines
+
+
+def _item_text(item) -> str:
+    # The item's own text, without nested lists but keeping the text that follows them
+    parts = [item.text or ""]
+    for child in item:
+        if child.tag in LIST_TAGS:
+            parts.append(" ")
+        elif isinstance(child.tag, str):
+            parts.append(child.text_content())
+        parts.append(child.tail or "")
+    return _clean("".join(parts))
+
+
+def _list_lines(list_el, depth: int = 0):
+    lines = []
+    for item in list_el:
+        if item.tag != "li":
+            continue
+        nested = [child for child in item if child.tag in LIST_TAGS]
+        text = _item_text(item)
+        if text:
+            lines.append(f"{'  ' * depth}- {text}")
+        for child in nested:
+            lines.extend(_list_lines(child, depth + 1))
+    return lines
+
+
+def _walk(el, blocks):
+    tag = el.tag if isinstance(el.tag, str) else ""
+    if tag in HEADING_TAGS:
+        text = _clean(el.text_content())
+        if text:
+            blocks.append(f"{'#' * int(tag[1])} {text}")
+        return
+    if tag == "table":
+        lines = _table_lines(el)
+        if lines:
+            blocks.append("\n".join(lines))
+        return
+    if tag in LIST_TAGS:
+        lines = _list_lines(el)
+        if lines:
+            blocks.append("\n".join(lines))
+        return
+    if tag in TEXT_BLOCK_TAGS:
+        text = _clean(el.text_content())
+        if text:
+            blocks.append(text)
+        return
+
+    # Generic container: keep loose text (e.g. <div>Some text<br>more</div>) as its own paragraph
+    if el.text and el.text.strip():
+        blocks.append(_clean(el.text))
+    for child in el:
+        _walk(child, blocks)
+        if child.tail and child.tail.strip():
+            blocks.append(_clean(child.tail))
+
+
+def extract_html(content) -> str:
+    """
+    Extracts the readable text of an HTML page, keeping its structure:
+    headings become markdown-style `#` lines, lists `- ` items and tables `a | b` rows,
+    with blocks separated by blank lines. Navigation, footers, scripts and similar
+    boilerplate are dropped.
+    """
+    if not content or not content.strip():
+        return ""
+    doc = lxml_html.fromstring(content)
+    _strip_boilerplate(doc)
+
+    blocks = []
+    _walk(_content_root(doc), blocks)
+
+    # Collapse repeated blocks (e.g. the same call-to-action rendered twice)
+    deduped = []
+    for block in blocks:
+        if not deduped or deduped[-1] != block:
+            deduped.append(block)
+    return "\n\n".join(deduped)
+
+
+def detect_format(filename: str, content_type: str = None, content: bytes = b""):
+    """
+    Returns one of the FORMAT_BY_EXTENSION values for a source, or None if unsupported.
+    The extension wins; the content type and leading bytes are used for URLs and
+    extensionless files.
+    """
+    fmt = FORMAT_BY_EXTENSION.get(os.path.splitext(filename or "")[1].lower())
+    if fmt:
+        return fmt
+    if content_type:
+        fmt = FORMAT_BY_CONTENT_TYPE.get(content_type.split(";")[0].strip().lower())
+        if fmt:
+            return fmt
+    head = content[:512].lstrip().lower()
+    if head.startswith(b"%pdf"):
+        return "pdf"
+    if head.startswith((b"<!doctype html", b"<html")):
+        return "html"
+    return None
+
+
+def decode_text(content: bytes) -> str:
+    for encoding in ("utf-8-sig", "cp1252"):
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return content.decode("utf-8", errors="replace")
+
+
+def extract_markdown(text: str) -> str:
+    """Keeps markdown structure (`#` headings, lists) but drops front matter, images and link targets."""
+    text = MD_FRONT_MATTER_RE.sub("", text)
+    text = MD_IMAGE_RE.sub("", text)
+    text = MD_LINK_RE.sub(r"\1", text)
+    return MD_SETEXT_RE.sub(lambda m: f"{'#' if m.group(2)[0] == '=' else '##'} {m.group(1).strip()}", text)
+
+
+def _docx_paragraph(p) -> str:
+    text = _clean("".join(
+        (el.text or "") if el.tag == f"{WORD_NS}t" else " "
+        for el in p.iter(f"{WORD_NS}t", f"{WORD_NS}tab", f"{WORD_NS}br")
+    ))
+    if not text:
+        return ""
+    style = p.find(f"{WORD_NS}pPr/{WORD_NS}pStyle")
+    style = style.get(f"{WORD_NS}val", "") if style is not None else ""
+    if style == "Title":
+        return f"# {text}"
+    match = re.match(r"Heading(\d)$", style)
+    if match:
+        return f"{'#' * min(6, int(match.group(1)))} {text}"
+    if p.find(f"{WORD_NS}pPr/{WORD_NS}numPr") is not None:
+        return f"- {text}"
+    return text
+
+
+def extract_docx(content: bytes) -> str:
+    """Extracts a .docx body in the same block format as extract_html."""
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        root = etree.fromstring(archive.read("word/document.xml"))
+    body = root.find(f"{WORD_NS}body")
+    if body is None:
+        return ""
+
+    blocks = []
+    for el in body:
+        if el.tag == f"{WORD_NS}p":
+            text = _docx_paragraph(el)
+            # Consecutive list items form one block
+            if text.startswith("- ") and blocks and blocks[-1].startswith("- "):
+                blocks[-1] += "\n" + text
+            elif text:
+                blocks.append(text)
+        elif el.tag == f"{WORD_NS}tbl":
+            rows = []
+            for tr in el.iter(f"{WORD_NS}tr"):
+                cells = [" ".join(filter(None, (_docx_paragraph(p) for p in tc.iter(f"{WORD_NS}p"))))
+                         for tc in tr.iter(f"{WORD_NS}tc")]
+                if any(cells):
+                    rows.append(" | ".join(cells))
+            if rows:
+                blocks.append("\n".join(rows))
+    return "\n\n".join(blocks)
+
+
+def extract_pdf_pages(content: bytes):
+    """Returns the text of each page of a PDF (0-based page index, like PyPDFLoader)."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    return [(i, page.extract_text() or "") for i, page in enumerate(reader.pages)]
+
+
+def extract_source(content: bytes, fmt: str):
+    """
+    Extracts the text of a source in any supported format.
+    Returns (text, extra_metadata) pairs: one per page for PDFs, a single one otherwise.
+    """
+    if fmt == "pdf":
+        return [(text, {"page": page}) for page, text in extract_pdf_pages(content) if text.strip()]
+    if fmt == "html":
+        text = extract_html(content)
+    elif fmt == "docx":
+        text = extract_docx(content)
+    elif fmt == "markdown":
+        text = extract_markdown(decode_text(content))
+    elif fmt == "text":
+        text = decode_text(content)
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+    return [(text, {})] if text.strip() else []
@@ -1,45 +1,104 @@
 import requests
-from bs4 import BeautifulSoup
-from langchain.docstore.document import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
+from dataclasses import dataclass, field
+from typing import Callable
+from app.core.config import settings
+from app.core.workers import get_process_pool, process_pool_size
+from app.services.chunking import TokenChunker
+from app.services.extraction import detect_format, extract_html, extract_source
+import asyncio
 import tempfile
+import threading
 import os
+import uuid
+import zipfile
+
+ARCHIVE_SKIP_PREFIXES = ("__MACOSX/", ".")
+
+@dataclass
+class BulkSource:
+    """One document of a bulk ingestion. `load()` returns (content, content_type or None)."""
+    name: str
+    load: Callable = field(repr=False)
+    is_url: bool = False
+
+def _read_limited(f, name: str) -> bytes:
+    data = f.read(settings.BULK_MAX_SOURCE_BYTES + 1)
+    if len(data) > settings.BULK_MAX_SOURCE_BYTES:
+        raise ValueError(f"{name} is larger than {settings.BULK_MAX_SOURCE_BYTES} bytes")
+    return data
+
+def file_source(filename: str, fileobj, content_type: str = None) -> BulkSource:
+    def load():
+        fileobj.seek(0)
+        return _read_limited(fileobj, filename), content_type
+    return BulkSource(name=filename, load=load)
+
+def archive_sources(filename: str, fileobj):
+    """
+    Yields a BulkSource per file in a zip archive. Only the central directory is read
+    here; each entry is decompressed when its source is loaded.
+    """
+    archive = zipfile.ZipFile(fileobj)
+    for info in archive.infolist():
+        if info.is_dir() or os.path.basename(info.filename).startswith(ARCHIVE_SKIP_PREFIXES) \
+                or info.filename.startswith(ARCHIVE_SKIP_PREFIXES):
+            continue
+        name = f"{filename}/{info.filename}"
+
+        def load(info=info, name=name):
+            if info.file_size > settings.BULK_MAX_SOURCE_BYTES:
+                raise ValueError(f"{name} is larger than {settings.BULK_MAX_SOURCE_BYTES} bytes")
+            with archive.open(info) as f:
+                return _read_limited(f, name), None
+        yield BulkSource(name=name, load=load)
+
+def url_source(url: str) -> BulkSource:
+    def load():
+        with requests.get(url, timeout=settings.URL_FETCH_TIMEOUT_SECONDS, stream=True) as response:
+            response.raise_for_status()
+            return _read_limited(response.raw, url), response.headers.get("content-type")
+    return BulkSource(name=url, load=load, is_url=True)
+
+def _extract_and_split(content: bytes, fmt: str, metadata: dict, chunk_tokens: int, overlap_tokens: int, encoding_name: str):
+    """Process pool entry point: parses one source and chunks it."""
+    chunker = TokenChunker(chunk_tokens, overlap_tokens, encoding_name)
+    return chunker.split_items([(text, {**metadata, **extra}) for text, extra in extract_source(content, fmt)])
 
 class IngestionService:
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        self.chunker = TokenChunker()
 
     async def ingest_url(self, url: str, bot_id: str):
         """Scrapes content from a URL."""
+        from langchain.docstore.document import Document
+
         try:
             response = requests.get(url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Simple extraction: get all paragraph text
-            text = ' '.join([p.get_text() for p in soup.find_all('p')])
+
+            # Pass bytes so lxml picks the charset from the document itself
+            text = extract_html(response.content)
             
             if not text:
                 return []
 
             doc = Document(page_content=text, metadata={"source": url, "type": "url", "botId": bot_id})
-            return self.text_splitter.split_documents([doc])
+            return await self.chunker.asplit_documents([doc])
         except Exception as e:
             print(f"Error ingesting URL {url}: {e}")
             raise e
 
     async def ingest_text(self, text: str, bot_id: str, source_name: str = "text_input"):
         """Ingests raw text."""
+        from langchain.docstore.document import Document
+
         doc = Document(page_content=text, metadata={"source": source_name, "type": "text", "botId": bot_id})
-        return self.text_splitter.split_documents([doc])
+        return await self.chunker.asplit_documents([doc])
 
     async def ingest_pdf(self, file_content: bytes, filename: str, bot_id: str):
         """Ingests a PDF file."""
+        from langchain_community.document_loaders import PyPDFLoader
+
         # Save bytes to a temp file because PyPDFLoader expects a path
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
             tmp.write(file_content)
@@ -55,8 +114,111 @@ class IngestionService:
                 doc.metadata["type"] = "pdf"
                 doc.metadata["botId"] = bot_id
             
-            return self.text_splitter.split_documents(documents)
+            return await self.chunker.asplit_documents(documents)
         finally:
             os.remove(tmp_path)
 
-ingestion_service = IngestionService()
+    async def ingest_bulk(self, sources, bot_id: str, vector_store):
+        """
+        Ingests many sources in one pass. Sources are loaded concurrently, parsed and chunked
+        in the process pool, and their chunks go through one shared queue that is embedded and
+        upserted in batches of BULK_EMBED_BATCH_SIZE. Returns one result per source, in order.
+        A source whose batch fails has the chunks this call wrote for it removed again, so it
+        is either fully ingested or not at all ("partial" if that cleanup failed too). Chunks
+        of an earlier ingestion of the same source are left alone.
+        """
+        from langchain.docstore.document import Document
+
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+        # Bounds how many sources are held in memory at once; the embedding queue applies backpressure
+        slots = asyncio.Semaphore(process_pool_size() * 2)
+        url_slots = asyncio.Semaphore(settings.BULK_URL_CONCURRENCY)
+        flush_lock = asyncio.Lock()
+        pending = []
+        # Ids of the chunks written (or being written) for each source in this call
+        written = {}
+        results = [{"source": source.name, "status": "ingested", "chunks": 0} for source in sources]
+
+        def fail(index: int, error: str):
+            results[index]["status"] = "failed"
+            results[index]["error"] = error
+            results[index]["chunks"] = 0
+
+        async def flush(final: bool = False):
+            async with flush_lock:
+                # Another task may have flushed while this one waited for the lock
+                if not pending or (not final and len(pending) < settings.BULK_EMBED_BATCH_SIZE):
+                    return
+                batch = pending[:settings.BULK_EMBED_BATCH_SIZE]
+                del pending[:len(batch)]
+                # Chunks of sources that already failed in an earlier batch are not written
+                batch = [(doc, index) for doc, index in batch if results[index]["status"] not in ("failed", "partial")]
+                if not batch:
+                    return
+                ids = [str(uuid.uuid4()) for _ in batch]
+                for id_, (_, index) in zip(ids, batch):
+                    written.setdefault(index, []).append(id_)
+                try:
+                    await loop.run_in_executor(None, vector_store.add_documents, [doc for doc, _ in batch], ids)
+                except Exception as e:
+                    print(f"Bulk ingestion batch failed: {e}")
+                    for index in sorted({index for _, index in batch}):
+                        fail(index, f"Embedding failed: {e}")
+                        # Remove the source's chunks written by this call so it is all or nothing
+                        try:
+                            await loop.run_in_executor(None, vector_store.delete_chunks, written.pop(index), bot_id)
+                        except Exception as cleanup_error:
+                            results[index]["status"] = "partial"
+                            results[index]["error"] += f"; its earlier chunks could not be removed: {cleanup_error}"
+
+        async def process(index: int, source: BulkSource):
+            async with slots:
+                try:
+                    if source.is_url:
+                        async with url_slots:
+                            content, content_type = await loop.run_in_executor(None, source.load)
+                    else:
+                        content, content_type = await loop.run_in_executor(None, source.load)
+
+                    fmt = detect_format("" if source.is_url else source.name, content_type, content)
+                    if fmt is None:
+                        results[index]["status"] = "skipped"
+                        results[index]["error"] = "Unsupported file format"
+                        return
+                    metadata = {"source": source.name, "type": "url" if source.is_url else fmt, "botId": bot_id}
+                    results[index]["type"] = metadata["type"]
+                    chunks = await loop.run_in_executor(
+                        pool, _extract_and_split, content, fmt, metadata,
+                        self.chunker.chunk_tokens, self.chunker.overlap_tokens, self.chunker.encoding_name
+                    )
+                except Exception as e:
+                    print(f"Error ingesting {source.name}: {e}")
+                    fail(index, str(e))
+                    return
+
+                if not chunks:
+                    results[index]["status"] = "skipped"
+                    results[index]["error"] = "No text found"
+                    return
+                results[index]["chunks"] = len(chunks)
+                pending.extend((Document(page_content=text, metadata=meta), index) for text, meta in chunks)
+                while len(pending) >= settings.BULK_EMBED_BATCH_SIZE:
+                    await flush()
+
+        await asyncio.gather(*(process(i, source) for i, source in enumerate(sources)))
+        while pending:
+            await flush(final=True)
+        return results
+
+_ingestion_service = None
+_ingestion_service_lock = threading.Lock()
+
+def get_ingestion_service() -> IngestionService:
+    """Returns the process-wide IngestionService, creating it on first use."""
+    global _ingestion_service
+    if _ingestion_service is None:
+        with _ingestion_service_lock:
+            if _ingestion_service is None:
+                _ingestion_service = IngestionService()
+    return _ingestion_service
@@ -0,0 +1,30 @@
+from app.core.config import settings
+import threading
+
+_llm = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    """Returns the shared chat model client, creating it on first use."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from langchain_ollama import ChatOllama
+                _llm = ChatOllama(
+                    model=settings.LLM_MODEL,
+                    base_url=settings.OLLAMA_BASE_URL,
+                    temperature=0,
+                    keep_alive=settings.OLLAMA_KEEP_ALIVE
+                )
+    return _llm
+
+def warm_up_llm():
+    """
+    Asks Ollama to load the chat model into memory without generating anything,
+    so the first chat doesn't pay the model load time.
+    """
+    import ollama
+
+    client = ollama.Client(host=settings.OLLAMA_BASE_URL)
+    client.generate(model=settings.LLM_MODEL, prompt="", keep_alive=settings.OLLAMA_KEEP_ALIVE)
@@ -0,0 +1,277 @@
+import asyncio
+import io
+import json
+import os
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, text
+from sqlalchemy.orm import noload
+from starlette.concurrency import run_in_threadpool
+from app import models
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.core.locks import acquire_exclusive_lock
+from app.services.chat_persistence import chat_writes
+
+LOCK_FILE = ".retention.lock"
+
+
+def _partition_path(domain_id: int, day: date) -> str:
+    return os.path.join(
+        settings.ARCHIVE_DIRECTORY,
+        f"domain={domain_id}",
+        f"{day:%Y}",
+        f"{day:%m}",
+        f"{day:%Y-%m-%d}.jsonl.zst"
+    )
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+class RetentionService:
+    """
+    Moves chat sessions that have been idle longer than their domain's retention period
+    out of the hot tables into zstd-compressed JSONL files, one file per domain and day
+    (by session start). Each batch is appended as its own zstd frame and fsynced before
+    the rows are deleted, so a crash can at worst archive a session twice, never lose it.
+    """
+
+    def __init__(self):
+        self._vacuum_hint_logged = False
+
+    def policies(self, db):
+        """Returns {domain_id: retention_days} for every domain that has retention enabled."""
+        explicit = {p.domain_id: p for p in db.query(models.RetentionPolicy).all()}
+        result = {}
+        for (domain_id,) in db.query(models.Domain.id).all():
+            policy = explicit.get(domain_id)
+            if policy is not None:
+                if policy.enabled and policy.retention_days > 0:
+                    result[domain_id] = policy.retention_days
+            elif settings.RETENTION_DEFAULT_DAYS > 0:
+                result[domain_id] = settings.RETENTION_DEFAULT_DAYS
+        return result
+
+    def _expired_session_ids(self, db, domain_id: int, cutoff: datetime, limit: int, exclude=()):
+        last_activity = func.coalesce(func.max(models.ChatMessage.timestamp), models.ChatSession.created_at)
+        query = db.query(models.ChatSession.id).outerjoin(
+            models.ChatMessage, models.ChatMessage.session_id == models.ChatSession.id
+        ).filter(
+            models.ChatSession.domain_id == domain_id
+        )
+        if exclude:
+            query = query.filter(models.ChatSession.id.notin_(exclude))
+        rows = query.group_by(models.ChatSession.id).having(last_activity < cutoff).limit(limit).all()
+        return [row.id for row in rows]
+
+    def _write_batch(self, domain_id: int, sessions, messages_by_session):
+        import zstandard
+
+        partitions = {}
+        for session in sessions:
+            messages = messages_by_session.get(session.id, [])
+            record = {
+                "id": session.id,
+                "domain_id": domain_id,
+                "user_email": session.user_email,
+                "created_at": _iso(session.created_at),
+                "last_activity": _iso(max((m.timestamp for m in messages if m.timestamp), default=session.created_at)),
+                "messages": [
+                    {"id": m.id, "role": m.role, "content": m.content, "timestamp": _iso(m.timestamp)}
+                    for m in messages
+                ],
+            }
+            day = (session.created_at or datetime.utcnow()).date()
+            partitions.setdefault(day, []).append(json.dumps(record, ensure_ascii=False))
+
+        compressor = zstandard.ZstdCompressor(level=10)
+        for day, lines in partitions.items():
+            path = _partition_path(domain_id, day)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            frame = compressor.compress(("\n".join(lines) + "\n").encode("utf-8"))
+            with open(path, "ab") as f:
+                f.write(frame)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def archive_domain(self, db, domain_id: int, retention_days: int) -> int:
+        """Archives and deletes this domain's expired sessions in batches. Returns the session count."""
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        archived = 0
+        # Sessions with chat messages still in the write-behind queue are active again; deleting
+        # them now would leave those messages without a session once they are written
+        skipped = set()
+        while True:
+            session_ids = self._expired_session_ids(db, domain_id, cutoff, settings.RETENTION_BATCH_SIZE, skipped)
+            if not session_ids:
+                return archived
+            pending = {session_id for session_id in session_ids if chat_writes.has_pending_messages(session_id)}
+            if pending:
+                skipped |= pending
+                session_ids = [session_id for session_id in session_ids if session_id not in pending]
+                if not session_ids:
+                    continue
+
+            # Messages are loaded below in one ordered query, not joined onto every session
+            sessions = db.query(models.ChatSession).options(noload(models.ChatSession.messages)).filter(
+                models.ChatSession.id.in_(session_ids)
+            ).all()
+            messages_by_session = {}
+            for message in db.query(models.ChatMessage).filter(
+                models.ChatMessage.session_id.in_(session_ids)
+            ).order_by(models.ChatMessage.session_id, models.ChatMessage.id):
+                messages_by_session.setdefault(message.session_id, []).append(message)
+
+            self._write_batch(domain_id, sessions, messages_by_session)
+
+            db.query(models.ChatMessage).filter(
+                models.ChatMessage.session_id.in_(session_ids)
+            ).delete(synchronize_session=False)
+            db.query(models.ChatSession).filter(
+                models.ChatSession.id.in_(session_ids)
+            ).delete(synchronize_session=False)
+            db.query(models.ChatSessionMerge).filter(
+                models.ChatSessionMerge.merged_into.in_(session_ids)
+            ).delete(synchronize_session=False)
+            db.commit()
+            db.expunge_all()
+            archived += len(session_ids)
+
+    def compact(self):
+        """Returns freed pages to the filesystem and refreshes planner statistics (SQLite only)."""
+        if engine.dialect.name != "sqlite":
+            return
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+                conn.execute(text(f"PRAGMA incremental_vacuum({int(settings.RETENTION_VACUUM_PAGES)})"))
+            elif not self._vacuum_hint_logged:
+                # Switching needs a full VACUUM, which locks the whole database while it rewrites it
+                print(
+                    "SQLite auto_vacuum is not incremental: archived rows' pages are reused but not "
+                    "returned to disk. Stop the server and run `python -m app.services.retention "
+                    "--enable-incremental-vacuum` once to change that."
+                )
+                self._vacuum_hint_logged = True
+            conn.execute(text("ANALYZE chat_sessions"))
+            conn.execute(text("ANALYZE chat_messages"))
+
+    def enable_incremental_vacuum(self):
+        """Offline step: switches SQLite to incremental auto-vacuum with a full VACUUM."""
+        if engine.dialect.name != "sqlite":
+            return
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+            conn.execute(text("VACUUM"))
+
+    def run_once(self) -> dict:
+        """
+        One retention pass over all domains. Only one process runs it at a time; others
+        return immediately. Returns {domain_id: archived_session_count}.
+        """
+        os.makedirs(settings.ARCHIVE_DIRECTORY, exist_ok=True)
+        lock = acquire_exclusive_lock(os.path.join(settings.ARCHIVE_DIRECTORY, LOCK_FILE))
+        if lock is None:
+            return {}
+
+        try:
+            # Write queued chats first so sessions that just got a message aren't seen as idle
+            chat_writes.flush()
+        except Exception as e:
+            print(f"Retention could not flush queued chat writes, skipping their sessions: {e}")
+
+        db = SessionLocal()
+        try:
+            results = {}
+            for domain_id, retention_days in self.policies(db).items():
+                try:
+                    archived = self.archive_domain(db, domain_id, retention_days)
+                except Exception as e:
+                    db.rollback()
+                    print(f"Retention failed for domain {domain_id}: {e}")
+                    continue
+                if archived:
+                    results[domain_id] = archived
+            if results:
+                self.compact()
+            return results
+        finally:
+            db.close()
+            lock.close()
+
+    async def run_periodically(self):
+        """Background loop started from the app lifespan."""
+        while True:
+            await asyncio.sleep(settings.RETENTION_INTERVAL_SECONDS)
+            try:
+                results = await run_in_threadpool(self.run_once)
+                if results:
+                    print(f"Retention archived sessions: {results}")
+            except Exception as e:
+                print(f"Retention run failed: {e}")
+
+    def _partitions(self, domain_id: int, start: date = None, end: date = None):
+        root = os.path.join(settings.ARCHIVE_DIRECTORY, f"domain={domain_id}")
+        if not os.path.isdir(root):
+            return []
+        paths = []
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if not filename.endswith(".jsonl.zst"):
+                    continue
+                day = date.fromisoformat(filename[:-len(".jsonl.zst")])
+                if (start and day < start) or (end and day > end):
+                    continue
+                paths.append((day, os.path.join(dirpath, filename)))
+        return [path for _, path in sorted(paths)]
+
+    def _read_partition(self, path: str):
+        import zstandard
+
+        with open(path, "rb") as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+            for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_archive(self, domain_id: int, start: date = None, end: date = None, user_email: str = None):
+        """
+        Yields archived session records for a domain, oldest partition first. A session archived
+        twice (crash between write and delete) is yielded once, as its last copy, even if the
+        copies are in different partitions. That takes a first pass that only keeps ids.
+        """
+        paths = self._partitions(domain_id, start, end)
+        last = {}
+        for number, path in enumerate(paths):
+            for position, record in enumerate(self._read_partition(path)):
+                last[record["id"]] = (number, position)
+
+        for number, path in enumerate(paths):
+            for position, record in enumerate(self._read_partition(path)):
+                if last[record["id"]] != (number, position):
+                    continue
+                if user_email and record.get("user_email") != user_email:
+                    continue
+                yield record
+
+    def iter_export_lines(self, domain_id: int, start: date = None, end: date = None):
+        """Yields the archive for a domain as NDJSON lines."""
+        for record in self.iter_archive(domain_id, start, end):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+retention_service = RetentionService()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chat history retention maintenance")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="switch SQLite to incremental auto-vacuum (full VACUUM; run with the server stopped)")
+    args = parser.parse_args()
+    if args.enable_incremental_vacuum:
+        retention_service.enable_incremental_vacuum()
+        print("SQLite now uses incremental auto-vacuum")
+    else:
+        parser.print_help()
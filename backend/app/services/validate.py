@@ -6,6 +6,25 @@ class ValidationService:
     def __init__(self):
         pass  # Add any initialization logic here if needed
 
+def resolve_domain(bot_id: str, hostname: str, db: Session):
+    """
+    Returns the Domain registered for this bot and hostname, or None.
+    'localhost' and '127.0.0.1' are treated as the same host for local development.
+    """
+    domain = db.query(Domain).filter(
+        Domain.bot_id == bot_id,
+        Domain.hostname == hostname
+    ).first()
+
+    if not domain and hostname in ['127.0.0.1', 'localhost']:
+        alt_hostname = 'localhost' if hostname == '127.0.0.1' else '127.0.0.1'
+        domain = db.query(Domain).filter(
+            Domain.bot_id == bot_id,
+            Domain.hostname == alt_hostname
+        ).first()
+
+    return domain
+
 def validate_bot(bot_id: str, hostname: str, db: Session):
     """
     Validates the bot ID and hostname against the database.
@@ -0,0 +1,376 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from app import models
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.locks import acquire_exclusive_lock
+from app.services.vector_store import collection_name_for, get_vector_store
+
+LOCK_FILE = ".index-rebuild.lock"
+# How often a worker that lost the lock race checks whether rebuilds are still queued
+LOCK_RETRY_SECONDS = 5
+# Metadata rows read per page when counting vectors per bot
+STATS_PAGE_SIZE = 5000
+# Parameters fixed when a collection is created; changing them takes a rebuild
+REBUILD_PARAMETERS = ("space", "max_neighbors", "ef_construction")
+
+
+def _directory_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class VectorIndexService:
+    """
+    Tuning, compaction and health reporting for the Chroma HNSW indexes (one per embedding model).
+
+    ef_search is stored in the live collection's configuration, but Chroma only reads it when
+    it loads the index (worker or `chroma run` restart). Space, M (max_neighbors) and
+    ef_construction are fixed when a collection is created. Changing them, applying ef_search
+    without a restart, or compacting an index that has accumulated deleted vectors rebuilds
+    it: a new collection is created with the wanted parameters and filled by copying the
+    stored embeddings (nothing is re-embedded) while writes go to both, then a single
+    VectorIndex row update switches reads to it and the old collection is dropped.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def indexes(self, db):
+        return db.query(models.VectorIndex).order_by(models.VectorIndex.model).all()
+
+    def _get(self, db, model: str, create: bool = False):
+        row = db.query(models.VectorIndex).filter(models.VectorIndex.model == model).first()
+        if row is None and create:
+            row = models.VectorIndex(model=model, status="active")
+            db.add(row)
+        return row
+
+    def _models_in_use(self, db):
+        used = {settings.EMBEDDING_MODEL}
+        for states in db.query(
+            models.BotEmbeddingState.active_model,
+            models.BotEmbeddingState.target_model,
+            models.BotEmbeddingState.previous_model
+        ):
+            used.update(model for model in states if model)
+        used.update(model for (model,) in db.query(models.VectorIndex.model))
+        return sorted(used)
+
+    def _require_known(self, db, model: str):
+        """Raises LookupError unless `model` is in use or already has a collection."""
+        if model in self._models_in_use(db):
+            return
+        store = get_vector_store()
+        try:
+            store.client.get_collection(store.collection_name(model))
+        except Exception:
+            raise LookupError(f"No index for embedding model {model}")
+
+    # Health
+
+    def stats(self, db, model: str = None):
+        """Vector counts (total and per bot), HNSW parameters and on-disk size of each index."""
+        store = get_vector_store()
+        rows = {row.model: row for row in self.indexes(db)}
+        results = []
+        for index_model in [model] if model else self._models_in_use(db):
+            row = rows.get(index_model)
+            name = store.collection_name(index_model)
+            entry = {
+                "model": index_model,
+                "collection": name,
+                "status": row.status if row else "active",
+                "configured": store.index_configuration(index_model),
+                "last_rebuilt_at": row.last_rebuilt_at if row else None,
+            }
+            try:
+                collection = store.client.get_collection(name)
+            except Exception:
+                results.append({**entry, "exists": False})
+                continue
+
+            per_bot = Counter()
+            offset = 0
+            while True:
+                page = collection.get(include=["metadatas"], limit=STATS_PAGE_SIZE, offset=offset)
+                for metadata in page["metadatas"]:
+                    per_bot[(metadata or {}).get("botId")] += 1
+                if len(page["ids"]) < STATS_PAGE_SIZE:
+                    break
+                offset += STATS_PAGE_SIZE
+
+            hnsw = (collection.configuration or {}).get("hnsw") or {}
+            vectors = collection.count()
+            results.append({
+                **entry,
+                "exists": True,
+                "vectors": vectors,
+                "vectors_per_bot": dict(per_bot.most_common()),
+                "hnsw": {key: hnsw.get(key) for key in ("space", "max_neighbors", "ef_construction", "ef_search")},
+                **self._disk_usage(collection, vectors),
+            })
+        return {"mode": store.mode, "indexes": results, **self._database_usage()}
+
+    def _vector_segment(self, collection):
+        path = os.path.join(settings.CHROMA_PERSIST_DIRECTORY, "chroma.sqlite3")
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            row = connection.execute(
+                "SELECT id FROM segments WHERE collection = ? AND scope = 'VECTOR'", (str(collection.id),)
+            ).fetchone()
+        finally:
+            connection.close()
+        return row[0] if row else None
+
+    def _disk_usage(self, collection, vectors: int) -> dict:
+        """
+        Size of the collection's HNSW files and the share of the graph taken by deleted vectors
+        (live count against everything ever added, as of the index's last flush to disk).
+        Only available in embedded mode.
+        """
+        if get_vector_store().mode != "embedded":
+            return {"index_bytes": None, "deleted_ratio": None}
+        try:
+            segment = self._vector_segment(collection)
+        except sqlite3.Error:
+            segment = None
+        if segment is None:
+            return {"index_bytes": None, "deleted_ratio": None}
+
+        directory = os.path.join(settings.CHROMA_PERSIST_DIRECTORY, segment)
+        deleted_ratio = None
+        try:
+            with open(os.path.join(directory, "index_metadata.pickle"), "rb") as f:
+                metadata = pickle.load(f)
+            added = metadata.get("total_elements_added") or 0
+            if added:
+                deleted_ratio = round(max(0.0, 1 - vectors / added), 4)
+        except (OSError, pickle.UnpicklingError, AttributeError, EOFError):
+            pass
+        return {"index_bytes": _directory_bytes(directory), "deleted_ratio": deleted_ratio}
+
+    def _database_usage(self) -> dict:
+        # Chunk text and metadata live in chroma.sqlite3, shared by all collections. Pages freed
+        # by deletes are reused but only returned to the OS by an offline `chroma vacuum`.
+        if get_vector_store().mode != "embedded":
+            return {"sqlite_bytes": None, "sqlite_free_bytes": None}
+        path = os.path.join(settings.CHROMA_PERSIST_DIRECTORY, "chroma.sqlite3")
+        try:
+            connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+                free_pages = connection.execute("PRAGMA freelist_count").fetchone()[0]
+            finally:
+                connection.close()
+            return {"sqlite_bytes": os.path.getsize(path), "sqlite_free_bytes": page_size * free_pages}
+        except (OSError, sqlite3.Error):
+            return {"sqlite_bytes": None, "sqlite_free_bytes": None}
+
+    # Tuning
+
+    def configure(self, db, model: str, **parameters):
+        """
+        Stores HNSW parameters for `model`. ef_search is also written to the live collection
+        (used once the index is reloaded); other changes mark the index rebuild_required.
+        Raises LookupError for an unknown model and ValueError during a rebuild.
+        """
+        self._require_known(db, model)
+        parameters = {key: value for key, value in parameters.items() if value is not None}
+        row = self._get(db, model, create=True)
+        if row.status == "rebuilding":
+            raise ValueError(f"The {model} index is being rebuilt; change its parameters once that has finished")
+        for key, value in parameters.items():
+            setattr(row, key, value)
+
+        store = get_vector_store()
+        collection = store.ensure_collection(store.collection_name(model), store.index_configuration(model))
+        if "ef_search" in parameters:
+            collection.modify(configuration={"hnsw": {"ef_search": parameters["ef_search"]}})
+
+        hnsw = (collection.configuration or {}).get("hnsw") or {}
+        if any(key in parameters and parameters[key] != hnsw.get(key) for key in REBUILD_PARAMETERS):
+            row.status = "rebuild_required"
+        db.commit()
+        store.invalidate_state()
+        return row
+
+    # Rebuild / compaction
+
+    def rebuild(self, db, model: str):
+        """
+        Queues an online rebuild of `model`'s index with its configured parameters, which also
+        drops deleted vectors. Raises LookupError for an unknown model, ValueError if it is
+        already rebuilding or a migration runs.
+        """
+        self._require_known(db, model)
+        row = self._get(db, model, create=True)
+        if row.status == "rebuilding":
+            raise ValueError(f"The {model} index is already being rebuilt")
+        if db.query(models.BotEmbeddingState.id).filter(models.BotEmbeddingState.status == "migrating").first():
+            raise ValueError("An embedding migration is running; rebuild the index once it has finished")
+        row.status = "rebuilding"
+        row.error = None
+        db.commit()
+        self.ensure_running()
+        return row
+
+    def ensure_running(self):
+        """Starts the background rebuild thread in this worker if it isn't running."""
+        with self._thread_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="vector-index-rebuild", daemon=True)
+            self._thread.start()
+
+    def _pending(self, db):
+        return db.query(models.VectorIndex).filter(
+            (models.VectorIndex.status == "rebuilding") | (models.VectorIndex.shadow_collection.isnot(None))
+        ).order_by(models.VectorIndex.id).first()
+
+    def resume_pending(self):
+        """Called on startup: restarts rebuilds interrupted by a restart and drops replaced collections."""
+        db = SessionLocal()
+        try:
+            pending = self._pending(db)
+        finally:
+            db.close()
+        if pending:
+            self.ensure_running()
+
+    def _run(self):
+        # Only one process rebuilds at a time; the others wait until it is done or gone
+        os.makedirs(settings.CHROMA_PERSIST_DIRECTORY, exist_ok=True)
+        lock_path = os.path.join(settings.CHROMA_PERSIST_DIRECTORY, LOCK_FILE)
+        while True:
+            lock = acquire_exclusive_lock(lock_path)
+            if lock is not None:
+                break
+            time.sleep(LOCK_RETRY_SECONDS)
+            db = SessionLocal()
+            try:
+                if self._pending(db) is None:
+                    return
+            finally:
+                db.close()
+
+        try:
+            while True:
+                db = SessionLocal()
+                try:
+                    row = self._pending(db)
+                    if row is None:
+                        return
+                    try:
+                        if row.status == "rebuilding":
+                            self._rebuild(db, row)
+                        self._retire(db, row)
+                    except Exception as e:
+                        db.rollback()
+                        print(f"Rebuilding the {row.model} index failed: {e}")
+                        self._abandon(db, row, str(e))
+                finally:
+                    db.close()
+        finally:
+            lock.close()
+
+    def _copy(self, source, target, ids):
+        """Copies vectors with their stored embeddings, documents and metadata."""
+        batch_size = settings.INDEX_REBUILD_BATCH_SIZE
+        for i in range(0, len(ids), batch_size):
+            batch = source.get(ids=ids[i:i + batch_size], include=["embeddings", "documents", "metadatas"])
+            if batch["ids"]:
+                target.upsert(
+                    ids=batch["ids"],
+                    embeddings=batch["embeddings"],
+                    documents=batch["documents"],
+                    metadatas=batch["metadatas"]
+                )
+
+    def _rebuild(self, db, row):
+        store = get_vector_store()
+        live = row.collection_name or collection_name_for(row.model)
+        if row.shadow_collection and row.shadow_collection != live:
+            # Left over from an interrupted rebuild: start again from scratch
+            store.drop_collection(row.shadow_collection)
+
+        configuration = {
+            key: getattr(row, key) or default
+            for key, default in (
+                ("space", settings.CHROMA_HNSW_SPACE),
+                ("max_neighbors", settings.CHROMA_HNSW_M),
+                ("ef_construction", settings.CHROMA_HNSW_EF_CONSTRUCTION),
+                ("ef_search", settings.CHROMA_HNSW_EF_SEARCH),
+            )
+        }
+        name = f"{collection_name_for(row.model)[:48]}-r{int(time.time())}"
+        print(f"Rebuilding the {row.model} index: {live} -> {name} {configuration}")
+        target = store.ensure_collection(name, configuration)
+        row.shadow_collection = name
+        db.commit()
+        store.invalidate_state()
+
+        # Workers start writing to both collections within EMBEDDING_STATE_CACHE_SECONDS; copy
+        # a snapshot meanwhile, then reconcile anything written or deleted during the copy.
+        source = store.ensure_collection(live)
+        self._copy(source, target, source.get(include=[])["ids"])
+        time.sleep(settings.EMBEDDING_STATE_CACHE_SECONDS)
+        source_ids = set(source.get(include=[])["ids"])
+        target_ids = set(target.get(include=[])["ids"])
+        if target_ids - source_ids:
+            target.delete(ids=list(target_ids - source_ids))
+        self._copy(source, target, list(source_ids - target_ids))
+
+        # Swap: reads move to the new collection; the old one keeps receiving writes until retired
+        row.collection_name = name
+        row.shadow_collection = live
+        row.status = "active"
+        row.last_rebuilt_at = datetime.utcnow()
+        db.commit()
+        store.invalidate_state()
+        print(f"Rebuilt the {row.model} index into {name} ({len(source_ids)} vectors)")
+
+    def _retire(self, db, row):
+        """Stops writing to the replaced collection once every worker reads the new one, then drops it."""
+        store = get_vector_store()
+        old = row.shadow_collection
+        if not old:
+            return
+        time.sleep(settings.EMBEDDING_STATE_CACHE_SECONDS)
+        row.shadow_collection = None
+        db.commit()
+        store.invalidate_state()
+        time.sleep(settings.EMBEDDING_STATE_CACHE_SECONDS)
+        store.drop_collection(old)
+
+    def _abandon(self, db, row, error: str):
+        store = get_vector_store()
+        row.error = error[:500]
+        if row.status == "rebuilding":
+            # The live collection was never touched; drop the half-built one
+            shadow = row.shadow_collection
+            row.status = "failed"
+        else:
+            # Failed while retiring the replaced collection: stop writing to it, leave it on disk
+            shadow = None
+            row.error = f"Could not drop replaced collection {row.shadow_collection}: {row.error}"[:500]
+        row.shadow_collection = None
+        db.commit()
+        store.invalidate_state()
+        if shadow:
+            time.sleep(settings.EMBEDDING_STATE_CACHE_SECONDS)
+            store.drop_collection(shadow)
+
+vector_index_service = VectorIndexService()
@@ -1,41 +1,304 @@
-from langchain_community.vectorstores import Chroma
-from langchain_ollama import OllamaEmbeddings
 from app.core.config import settings
+from app.core.locks import acquire_exclusive_lock, read_lock_owner
 import os
+import re
+import threading
+import time
+import uuid
+
+WRITER_LOCK_FILE = ".writer.lock"
+COLLECTION_NAME = "aisitebot_collection"
+# The original collection predates model-versioned names and holds nomic-embed-text vectors
+LEGACY_EMBEDDING_MODEL = "nomic-embed-text"
+
+def collection_name_for(model: str) -> str:
+    """Chroma collection holding the vectors produced by `model`."""
+    if model == LEGACY_EMBEDDING_MODEL:
+        return COLLECTION_NAME
+    slug = re.sub(r"[^a-zA-Z0-9_-]+", "-", model).strip("-_")
+    return f"aisitebot_{slug}"[:63]
 
 class VectorStoreService:
-    def __init__(self):
+    def __init__(self, mode: str = None):
+        self.mode = mode or settings.CHROMA_MODE
+        self._writer_lock = None
+        self.client = self._create_client()
+
+        # One LangChain store per Chroma collection; each embedding model has its own collection
+        self._stores = {}
+        self._stores_lock = threading.Lock()
+        self._bot_models = {}
+        self._indexes = {}
+        self._state_loaded_at = 0.0
+
+        self.store_for(settings.EMBEDDING_MODEL)
+
+    @property
+    def vector_db(self):
+        """LangChain store currently serving EMBEDDING_MODEL (follows index rebuilds)."""
+        return self.store_for(settings.EMBEDDING_MODEL)
+
+    @property
+    def embeddings(self):
+        return self.embeddings_for(settings.EMBEDDING_MODEL)
+
+    def _store(self, name: str, model: str):
+        store = self._stores.get(name)
+        if store is None:
+            # Heavy imports (chromadb, onnxruntime, LangChain) are deferred until the service is built
+            from langchain_community.vectorstores import Chroma
+            from langchain_ollama import OllamaEmbeddings
+
+            with self._stores_lock:
+                store = self._stores.get(name)
+                if store is None:
+                    # Create the collection first so it gets this model's HNSW parameters
+                    self.ensure_collection(name, self.index_configuration(model))
+                    store = Chroma(
+                        client=self.client,
+                        embedding_function=OllamaEmbeddings(model=model, base_url=settings.OLLAMA_BASE_URL),
+                        collection_name=name
+                    )
+                    self._stores[name] = store
+        return store
+
+    def store_for(self, model: str):
+        """Returns the LangChain Chroma store serving an embedding model, creating it on first use."""
+        return self._store(self.collection_name(model), model)
+
+    def _write_stores(self, model: str):
+        stores = [self.store_for(model)]
+        shadow = self.shadow_collection(model)
+        if shadow:
+            stores.append(self._store(shadow, model))
+        return stores
+
+    def embeddings_for(self, model: str):
+        return self.store_for(model).embeddings
+
+    def ensure_collection(self, name: str, configuration: dict = None):
+        """Returns a raw chromadb collection, creating it with the given HNSW parameters if missing."""
+        from chromadb.errors import NotFoundError
+
+        try:
+            return self.client.get_collection(name)
+        except (NotFoundError, ValueError):
+            hnsw = {key: value for key, value in (configuration or {}).items() if value is not None}
+            return self.client.get_or_create_collection(name, configuration={"hnsw": hnsw} if hnsw else None)
+
+    def collection_for(self, model: str):
+        """Raw chromadb collection for an embedding model (used by bulk copy jobs)."""
+        return self.ensure_collection(self.collection_name(model), self.index_configuration(model))
+
+    def delete_vectors(self, model: str, where: dict):
+        """Deletes matching chunks from every collection holding `model`'s vectors."""
+        for name in filter(None, (self.collection_name(model), self.shadow_collection(model))):
+            self.ensure_collection(name, self.index_configuration(model)).delete(where=where)
+
+    def drop_collection(self, name: str):
+        """Deletes a whole collection (a replaced index) and forgets its cached store."""
+        from chromadb.errors import NotFoundError
+
+        with self._stores_lock:
+            self._stores.pop(name, None)
+        try:
+            self.client.delete_collection(name)
+        except (NotFoundError, ValueError):
+            pass
+
+    def _load_state(self):
+        from app.core.database import SessionLocal
+        from app.models import BotEmbeddingState, VectorIndex
+
+        db = SessionLocal()
+        try:
+            bots = db.query(
+                BotEmbeddingState.bot_id,
+                BotEmbeddingState.active_model,
+                BotEmbeddingState.target_model,
+                BotEmbeddingState.previous_model
+            ).all()
+            indexes = db.query(VectorIndex).all()
+        finally:
+            db.close()
+        self._bot_models = {row.bot_id: (row.active_model, row.target_model, row.previous_model) for row in bots}
+        self._indexes = {
+            index.model: {
+                "collection": index.collection_name,
+                "shadow": index.shadow_collection,
+                "configuration": {
+                    "space": index.space,
+                    "max_neighbors": index.max_neighbors,
+                    "ef_construction": index.ef_construction,
+                    "ef_search": index.ef_search,
+                },
+            }
+            for index in indexes
+        }
+        self._state_loaded_at = time.monotonic()
+
+    def _refresh_state(self):
+        if time.monotonic() - self._state_loaded_at > settings.EMBEDDING_STATE_CACHE_SECONDS:
+            self._load_state()
+
+    def _bot_state(self, bot_id: str):
+        self._refresh_state()
+        return self._bot_models.get(bot_id)
+
+    def _index_state(self, model: str):
+        self._refresh_state()
+        return self._indexes.get(model)
+
+    def invalidate_state(self):
+        """Forces the next lookup to re-read bot -> model and model -> collection assignments."""
+        self._state_loaded_at = 0.0
+
+    def collection_name(self, model: str) -> str:
+        """Collection currently serving `model`; changes when its index is rebuilt."""
+        index = self._index_state(model)
+        return (index and index["collection"]) or collection_name_for(model)
+
+    def shadow_collection(self, model: str):
+        """Collection being rebuilt for `model` (or just replaced by a rebuild); it receives writes too."""
+        index = self._index_state(model)
+        return index["shadow"] if index else None
+
+    def index_configuration(self, model: str) -> dict:
+        """HNSW parameters for `model`'s collection: its VectorIndex row, else the settings defaults."""
+        index = self._index_state(model)
+        configuration = index["configuration"] if index else {}
+        return {
+            "space": configuration.get("space") or settings.CHROMA_HNSW_SPACE,
+            "max_neighbors": configuration.get("max_neighbors") or settings.CHROMA_HNSW_M,
+            "ef_construction": configuration.get("ef_construction") or settings.CHROMA_HNSW_EF_CONSTRUCTION,
+            "ef_search": configuration.get("ef_search") or settings.CHROMA_HNSW_EF_SEARCH,
+        }
+
+    def active_model(self, bot_id: str = None) -> str:
+        """Embedding model whose collection serves reads for this bot."""
+        state = self._bot_state(bot_id) if bot_id else None
+        return state[0] if state else settings.EMBEDDING_MODEL
+
+    def write_models(self, bot_id: str = None):
+        """
+        Every model whose collection must receive this bot's writes: the active one, the
+        target of a running migration, and the previous one after a cutover (for rollback).
+        """
+        state = self._bot_state(bot_id) if bot_id else None
+        if not state:
+            return [settings.EMBEDDING_MODEL]
+        return list(dict.fromkeys(model for model in state if model))
+
+    def _create_client(self):
+        """
+        Embedded mode opens the persist directory in this process and must be its only writer.
+        Server mode talks to a shared `chroma run` process; the HTTP client keeps a pooled
+        keep-alive connection, so every worker can use it without copying the index.
+        """
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
+        client_settings = ChromaSettings(anonymized_telemetry=False)
+
+        if self.mode == "server":
+            return chromadb.HttpClient(
+                host=settings.CHROMA_SERVER_HOST,
+                port=settings.CHROMA_SERVER_PORT,
+                settings=client_settings
+            )
+        if self.mode != "embedded":
+            raise ValueError(f"Unknown CHROMA_MODE '{self.mode}', expected 'embedded' or 'server'")
+
         # Ensure the persist directory exists
         if not os.path.exists(settings.CHROMA_PERSIST_DIRECTORY):
             os.makedirs(settings.CHROMA_PERSIST_DIRECTORY)
 
-        # Using a standard embedding model for Ollama
-        self.embeddings = OllamaEmbeddings(model="nomic-embed-text")
-        self.vector_db = Chroma(
-            persist_directory=settings.CHROMA_PERSIST_DIRECTORY,
-            embedding_function=self.embeddings,
-            collection_name="aisitebot_collection"
+        lock_path = os.path.join(settings.CHROMA_PERSIST_DIRECTORY, WRITER_LOCK_FILE)
+        self._writer_lock = acquire_exclusive_lock(lock_path)
+        if self._writer_lock is None:
+            raise RuntimeError(
+                f"'{settings.CHROMA_PERSIST_DIRECTORY}' is already opened by process "
+                f"{read_lock_owner(lock_path) or 'unknown'}. Embedded Chroma supports a single "
+                "writer; run `chroma run --path <dir>` and set CHROMA_MODE=server to use multiple workers."
+            )
+
+        return chromadb.PersistentClient(
+            path=settings.CHROMA_PERSIST_DIRECTORY,
+            settings=client_settings
         )
 
-    def add_documents(self, documents):
-        """Adds a list of documents to the vector store."""
-        if documents:
-            self.vector_db.add_documents(documents)
-            # self.vector_db.persist() # Chroma in newer versions persists automatically or on specific calls
+    def heartbeat(self):
+        """Cheap liveness check against the Chroma client."""
+        return self.client.heartbeat()
+
+    def warm_up(self):
+        """Embeds a probe query and touches the collection so the first chat doesn't pay for it."""
+        store = self.store_for(settings.EMBEDDING_MODEL)
+        store.embeddings.embed_query("warm-up")
+        store.get(limit=1)
+
+    def close(self):
+        """Releases the embedded writer lock."""
+        if self._writer_lock is not None:
+            self._writer_lock.close()
+            self._writer_lock = None
+
+    def add_documents(self, documents, ids=None):
+        """
+        Adds a list of documents to the vector store. Each chunk is stamped with the model
+        that embedded it and written under the same id to every collection the bot writes to.
+        `ids` (one per document) are generated if not given.
+        """
+        from langchain.docstore.document import Document
+
+        if not documents:
+            return
+
+        by_bot = {}
+        for doc, id_ in zip(documents, ids or [str(uuid.uuid4()) for _ in documents]):
+            by_bot.setdefault(doc.metadata.get("botId"), []).append((doc, id_))
+
+        for bot_id, entries in by_bot.items():
+            bot_ids = [id_ for _, id_ in entries]
+            for model in self.write_models(bot_id):
+                stamped = [
+                    Document(page_content=doc.page_content, metadata={**doc.metadata, "embedding_model": model})
+                    for doc, _ in entries
+                ]
+                for store in self._write_stores(model):
+                    store.add_documents(stamped, ids=bot_ids)
 
     def similarity_search(self, query: str, bot_id: str = None, k: int = 4):
         """Searches for documents similar to the query, filtered by bot_id."""
         kwargs = {"k": k}
         if bot_id:
             kwargs["filter"] = {"botId": bot_id}
-        return self.vector_db.similarity_search(query, **kwargs)
+        return self.store_for(self.active_model(bot_id)).similarity_search(query, **kwargs)
 
     def get_retriever(self, bot_id: str = None):
         search_kwargs = {"k": 4}
         if bot_id:
             search_kwargs["filter"] = {"botId": bot_id}
-        return self.vector_db.as_retriever(search_kwargs=search_kwargs)
+        return self.store_for(self.active_model(bot_id)).as_retriever(search_kwargs=search_kwargs)
         
+    def list_documents_by_bot(self, bot_ids):
+        """Like list_documents for many bots at once: one query per embedding model in use."""
+        by_model = {}
+        for bot_id in bot_ids:
+            by_model.setdefault(self.active_model(bot_id), []).append(bot_id)
+
+        documents = {bot_id: [] for bot_id in bot_ids}
+        seen = set()
+        for model, model_bot_ids in by_model.items():
+            where_filter = {"botId": model_bot_ids[0]} if len(model_bot_ids) == 1 else {"botId": {"$in": model_bot_ids}}
+            data = self.store_for(model).get(where=where_filter, include=["metadatas"])
+            for metadata in data.get("metadatas") or []:
+                key = (metadata.get("botId"), metadata.get("source"))
+                if key[1] and key[0] in documents and key not in seen:
+                    seen.add(key)
+                    documents[key[0]].append({"source": key[1], "type": metadata.get("type", "unknown")})
+        return documents
+
     def list_documents(self, bot_id: str = None):
         """Lists all unique documents in the vector store for a specific bot."""
         try:
@@ -44,7 +307,7 @@ class VectorStoreService:
             if bot_id:
                 where_filter = {"botId": bot_id}
                 
-            data = self.vector_db.get(where=where_filter)
+            data = self.store_for(self.active_model(bot_id)).get(where=where_filter, include=["metadatas"])
             
             if not data or not data['metadatas']:
                 return []
@@ -81,10 +344,37 @@ class VectorStoreService:
                     ]
                 }
             
-            self.vector_db.delete(where=where_filter)
+            for model in self.write_models(bot_id):
+                for store in self._write_stores(model):
+                    store.delete(where=where_filter)
             return True
         except Exception as e:
             print(f"Error deleting document {source}: {e}")
             raise e
 
-vector_store = VectorStoreService()
+    def delete_chunks(self, ids, bot_id: str = None):
+        """Deletes chunks by id from every collection the bot writes to."""
+        if not ids:
+            return
+        for model in self.write_models(bot_id):
+            for store in self._write_stores(model):
+                store.delete(ids=list(ids))
+
+_vector_store = None
+_vector_store_lock = threading.Lock()
+
+def get_vector_store() -> VectorStoreService:
+    """Returns the process-wide VectorStoreService, creating it on first use."""
+    global _vector_store
+    if _vector_store is None:
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = VectorStoreService()
+    return _vector_store
+
+def close_vector_store():
+    global _vector_store
+    with _vector_store_lock:
+        if _vector_store is not None:
+            _vector_store.close()
+            _vector_store = None
@@ -0,0 +1,96 @@
+"""
+Reports, per source, how many bytes would be embedded and stored with the legacy
+pipeline (BeautifulSoup <p> text + 1000/200 character splitter) versus the current one
+(lxml structural extraction + token-budgeted chunker).
+
+    python -m benchmarks.chunking_report https://example.com/pricing docs/manual.pdf notes.txt --output chunking.json
+"""
+import argparse
+import json
+import os
+
+import requests
+
+
+def legacy_extract_html(content: bytes) -> str:
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, "html.parser")
+    return " ".join(p.get_text() for p in soup.find_all("p"))
+
+
+def legacy_split(texts):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, separators=["\n\n", "\n", " ", ""])
+    return [chunk for text in texts for chunk in splitter.split_text(text)]
+
+
+def current_split(texts):
+    from app.services.chunking import TokenChunker
+    chunker = TokenChunker()
+    return [chunk for text in texts for chunk, _ in chunker.split_text(text)]
+
+
+def load_source(source: str):
+    """Returns (legacy_texts, current_texts) for a URL or a local .html/.pdf/.txt/.md file."""
+    from app.services.extraction import extract_html
+
+    if source.startswith(("http://", "https://")):
+        content = requests.get(source, timeout=30).content
+        return [legacy_extract_html(content)], [extract_html(content)]
+
+    with open(source, "rb") as f:
+        content = f.read()
+    suffix = os.path.splitext(source)[1].lower()
+    if suffix in (".html", ".htm"):
+        return [legacy_extract_html(content)], [extract_html(content)]
+    if suffix == ".pdf":
+        import io
+        from pypdf import PdfReader
+        pages = [page.extract_text() or "" for page in PdfReader(io.BytesIO(content)).pages]
+        return pages, pages
+    text = content.decode("utf-8", errors="replace")
+    return [text], [text]
+
+
+def _stats(texts, chunks):
+    extracted = sum(len(t.encode("utf-8")) for t in texts)
+    embedded = sum(len(c.encode("utf-8")) for c in chunks)
+    return {
+        "extracted_bytes": extracted,
+        "chunks": len(chunks),
+        "embedded_bytes": embedded,
+        "embedded_to_extracted": embedded / extracted if extracted else None,
+    }
+
+
+def report(sources):
+    rows = []
+    for source in sources:
+        legacy_texts, current_texts = load_source(source)
+        legacy = _stats(legacy_texts, legacy_split(legacy_texts))
+        current = _stats(current_texts, current_split(current_texts))
+        rows.append({"source": source, "legacy": legacy, "current": current})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    rows = report(args.sources)
+    for row in rows:
+        legacy, current = row["legacy"], row["current"]
+        print(
+            f"{row['source']}\n"
+            f"  legacy : {legacy['chunks']:5d} chunks {legacy['embedded_bytes']:9d} B embedded (extracted {legacy['extracted_bytes']} B)\n"
+            f"  current: {current['chunks']:5d} chunks {current['embedded_bytes']:9d} B embedded (extracted {current['extracted_bytes']} B)"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
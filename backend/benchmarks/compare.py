@@ -0,0 +1,55 @@
+"""
+Compares two benchmark result files written by benchmarks.run.
+
+    python -m benchmarks.compare results/before.json results/after.json
+"""
+import argparse
+import json
+
+METRICS = ("rps", "p50_ms", "p90_ms", "p99_ms", "errors", "chunks_per_s")
+
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+def _delta(before, after):
+    if before in (None, 0) or after is None:
+        return "-"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(before: dict, after: dict):
+    rows = []
+    for name in sorted(set(before["scenarios"]) | set(after["scenarios"])):
+        b = before["scenarios"].get(name, {})
+        a = after["scenarios"].get(name, {})
+        for metric in METRICS:
+            if metric in b or metric in a:
+                rows.append((name, metric, _fmt(b.get(metric)), _fmt(a.get(metric)), _delta(b.get(metric), a.get(metric))))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('git_revision')}  after: {after['meta'].get('git_revision')}")
+    header = ("scenario", "metric", "before", "after", "change")
+    rows = [header] + compare(before, after)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    for row in rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+
+if __name__ == "__main__":
+    main()
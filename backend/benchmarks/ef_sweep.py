@@ -0,0 +1,205 @@
+"""
+Measures recall@k against latency for a range of HNSW ef_search values, to pick the one to
+set with PUT /api/v1/admin/vector-index.
+
+Vectors are exported from an existing collection (stored embeddings, nothing is re-embedded),
+a held-out sample is used as queries, and the exact top-k of each query is computed by brute
+force. The rest is indexed into a temporary in-memory collection with the same space, M and
+ef_construction (or the ones given), once per ef value: Chroma only reads ef_search when an
+index is loaded, so modifying it on a loaded collection has no effect. Queries are filtered
+by the bot they came from, like chat retrieval.
+
+    cd backend
+    python -m benchmarks.ef_sweep --path chroma_db --queries 200 --k 4 --ef 10,20,40,80,160 --output ef.json
+    python -m benchmarks.ef_sweep --host localhost --port 8001 --collection aisitebot_collection
+
+Run it against a copy of the persist directory, or against the Chroma server, rather than a
+directory an embedded worker currently has open.
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+EXPORT_PAGE_SIZE = 5000
+
+
+def open_client(args):
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    client_settings = ChromaSettings(anonymized_telemetry=False)
+    if args.host:
+        return chromadb.HttpClient(host=args.host, port=args.port, settings=client_settings)
+    return chromadb.PersistentClient(path=args.path, settings=client_settings)
+
+
+def default_collection() -> str:
+    """Collection serving EMBEDDING_MODEL: the one its last rebuild swapped in, else the default name."""
+    from app import models
+    from app.core.config import settings
+    from app.core.database import SessionLocal
+    from app.services.vector_store import collection_name_for
+
+    db = SessionLocal()
+    try:
+        index = db.query(models.VectorIndex).filter(models.VectorIndex.model == settings.EMBEDDING_MODEL).first()
+    finally:
+        db.close()
+    return (index and index.collection_name) or collection_name_for(settings.EMBEDDING_MODEL)
+
+
+def export_vectors(collection, bot_id: str = None):
+    """Returns (ids, embeddings matrix, bot ids) of every vector in the collection."""
+    ids, embeddings, bots = [], [], []
+    offset = 0
+    where = {"botId": bot_id} if bot_id else None
+    while True:
+        page = collection.get(where=where, include=["embeddings", "metadatas"], limit=EXPORT_PAGE_SIZE, offset=offset)
+        ids.extend(page["ids"])
+        embeddings.extend(page["embeddings"])
+        bots.extend((metadata or {}).get("botId") for metadata in page["metadatas"])
+        if len(page["ids"]) < EXPORT_PAGE_SIZE:
+            break
+        offset += EXPORT_PAGE_SIZE
+    return ids, np.asarray(embeddings, dtype=np.float32), np.asarray(bots, dtype=object)
+
+
+def distances(space: str, query, matrix):
+    if space == "cosine":
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        return 1 - (matrix @ query) / np.where(norms == 0, 1, norms)
+    if space == "ip":
+        return 1 - matrix @ query
+    return ((matrix - query) ** 2).sum(axis=1)
+
+
+def exact_top_k(space: str, query, matrix, ids, k: int):
+    scores = distances(space, query, matrix)
+    top = np.argsort(scores, kind="stable")[:k]
+    return [ids[i] for i in top]
+
+
+def build_index(client, ids, embeddings, bots, hnsw: dict):
+    collection = client.create_collection(f"ef-sweep-{hnsw['ef_search']}", configuration={"hnsw": hnsw})
+    batch_size = client.get_max_batch_size()
+    for i in range(0, len(ids), batch_size):
+        collection.add(
+            ids=ids[i:i + batch_size],
+            embeddings=embeddings[i:i + batch_size],
+            metadatas=[{"botId": bot or ""} for bot in bots[i:i + batch_size]]
+        )
+    return collection
+
+
+def sweep(index, queries, k: int, ef_values, hnsw: dict, filter_by_bot: bool, repeats: int):
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    client = chromadb.EphemeralClient(settings=ChromaSettings(anonymized_telemetry=False))
+    rows = []
+    for ef in ef_values:
+        started = time.perf_counter()
+        collection = build_index(client, *index, {**hnsw, "ef_search": ef})
+        print(f"ef_search={ef}: indexed {len(index[0])} vectors in {time.perf_counter() - started:.1f}s")
+        recalls, latencies = [], []
+        for _ in range(repeats):
+            for vector, bot, truth in queries:
+                where = {"botId": bot or ""} if filter_by_bot else None
+                started = time.perf_counter()
+                found = collection.query(query_embeddings=[vector], n_results=k, where=where, include=[])["ids"][0]
+                latencies.append((time.perf_counter() - started) * 1000)
+                recalls.append(len(set(found) & set(truth)) / len(truth) if truth else 1.0)
+        latencies.sort()
+        rows.append({
+            "ef_search": ef,
+            "recall_at_k": statistics.fmean(recalls),
+            "p50_ms": latencies[len(latencies) // 2],
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "mean_ms": statistics.fmean(latencies),
+        })
+        client.delete_collection(collection.name)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="chroma_db", help="Chroma persist directory (embedded)")
+    parser.add_argument("--host", help="Chroma server host (instead of --path)")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--collection", help="defaults to the collection currently serving EMBEDDING_MODEL")
+    parser.add_argument("--bot-id", help="only sweep this bot's vectors")
+    parser.add_argument("--no-filter", action="store_true", help="query without the botId filter")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4, help="results per query (the chat retriever uses 4)")
+    parser.add_argument("--ef", default="10,20,40,80,160,320", help="comma-separated ef_search values")
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"])
+    parser.add_argument("--max-neighbors", type=int)
+    parser.add_argument("--ef-construction", type=int)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if not args.collection:
+        args.collection = default_collection()
+
+    source = open_client(args).get_collection(args.collection)
+    source_hnsw = (source.configuration or {}).get("hnsw") or {}
+    hnsw = {
+        "space": args.space or source_hnsw.get("space") or "l2",
+        "max_neighbors": args.max_neighbors or source_hnsw.get("max_neighbors") or 16,
+        "ef_construction": args.ef_construction or source_hnsw.get("ef_construction") or 100,
+    }
+
+    ids, embeddings, bots = export_vectors(source, args.bot_id)
+    if len(ids) <= args.queries:
+        parser.error(f"{args.collection} has {len(ids)} vectors; need more than --queries {args.queries}")
+    print(f"Exported {len(ids)} vectors ({embeddings.shape[1]} dims) from {args.collection}, hnsw {hnsw}")
+
+    # Held-out queries: they are not in the index, like real questions
+    rng = np.random.default_rng(args.seed)
+    held_out = np.zeros(len(ids), dtype=bool)
+    held_out[rng.choice(len(ids), size=args.queries, replace=False)] = True
+    index_ids = [id_ for id_, out in zip(ids, held_out) if not out]
+    index_embeddings, index_bots = embeddings[~held_out], bots[~held_out]
+
+    filter_by_bot = not args.no_filter
+    queries = []
+    for vector, bot in zip(embeddings[held_out], bots[held_out]):
+        mask = index_bots == bot if filter_by_bot else np.ones(len(index_ids), dtype=bool)
+        candidates = [id_ for id_, keep in zip(index_ids, mask) if keep]
+        queries.append((vector, bot, exact_top_k(hnsw["space"], vector, index_embeddings[mask], candidates, args.k)))
+
+    ef_values = [int(value) for value in args.ef.split(",") if value.strip()]
+    rows = sweep((index_ids, index_embeddings, index_bots), queries, args.k, ef_values, hnsw, filter_by_bot, args.repeats)
+
+    print(f"{'ef_search':>9}  {'recall@' + str(args.k):>9}  {'p50 ms':>8}  {'p95 ms':>8}")
+    for row in rows:
+        print(f"{row['ef_search']:>9}  {row['recall_at_k']:>9.4f}  {row['p50_ms']:>8.2f}  {row['p95_ms']:>8.2f}")
+    good = [row for row in rows if row["recall_at_k"] >= args.target_recall]
+    suggested = min(row["ef_search"] for row in good) if good else None
+    if suggested:
+        print(f"Smallest ef_search with recall@{args.k} >= {args.target_recall}: {suggested}")
+    else:
+        print(f"No ef_search value reached recall@{args.k} >= {args.target_recall}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "collection": args.collection,
+                "vectors": len(index_ids),
+                "queries": args.queries,
+                "k": args.k,
+                "filter_by_bot": filter_by_bot,
+                "hnsw": hnsw,
+                "results": rows,
+                "suggested_ef_search": suggested,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Offline stand-in for the Ollama HTTP API used by the backend.
+
+  * /api/embed, /api/embeddings: deterministic hashed bag-of-words vectors, so texts sharing
+    words are close and retrieval behaves sensibly without a real model
+  * /api/chat, /api/generate: streamed canned answers with configurable time-to-first-token
+    and token rate
+  * /api/tags, /api/show, /api/version: enough for client validation calls
+
+Run standalone:
+
+    python -m benchmarks.fake_ollama --port 11500 --first-token-ms 150 --tokens-per-second 40
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+EMBEDDING_DIM = 768
+WORD_RE = re.compile(r"\w+")
+
+
+@dataclass
+class FakeOllamaConfig:
+    embedding_dim: int = EMBEDDING_DIM
+    embed_latency_ms: float = 0.0
+    first_token_ms: float = 0.0
+    tokens_per_second: float = 0.0  # 0 disables the per-token delay
+    answer_tokens: int = 32
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM):
+    """Hashes each word into a signed bucket and L2-normalises the result."""
+    vector = [0.0] * dim
+    for word in WORD_RE.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return [v / norm for v in vector]
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _answer_tokens(prompt: str, count: int):
+    """Deterministic answer built from the prompt's own words."""
+    words = WORD_RE.findall(prompt) or ["ok"]
+    return [words[i % len(words)] + " " for i in range(count)]
+
+
+def _done_fields(model: str, prompt_tokens: int, eval_tokens: int, started: float):
+    elapsed = int((time.perf_counter() - started) * 1e9)
+    return {
+        "model": model,
+        "created_at": _now(),
+        "done": True,
+        "done_reason": "stop",
+        "total_duration": elapsed,
+        "load_duration": 0,
+        "prompt_eval_count": prompt_tokens,
+        "prompt_eval_duration": 0,
+        "eval_count": eval_tokens,
+        "eval_duration": elapsed,
+    }
+
+
+class FakeOllama:
+    def __init__(self, config: FakeOllamaConfig = None):
+        self.config = config or FakeOllamaConfig()
+        self.stats = {"embed_requests": 0, "embedded_texts": 0, "chat_requests": 0, "generate_requests": 0}
+
+    def build_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/", self.root)
+        app.router.add_get("/api/version", self.version)
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_post("/api/show", self.show)
+        app.router.add_post("/api/embed", self.embed)
+        app.router.add_post("/api/embeddings", self.embeddings_legacy)
+        app.router.add_post("/api/chat", self.chat)
+        app.router.add_post("/api/generate", self.generate)
+        return app
+
+    async def root(self, request):
+        return web.Response(text="Ollama is running")
+
+    async def version(self, request):
+        return web.json_response({"version": "0.0.0-fake"})
+
+    async def tags(self, request):
+        return web.json_response({"models": [
+            {"name": name, "model": name, "modified_at": _now(), "size": 0, "digest": "fake", "details": {}}
+            for name in ("llama3.2:latest", "nomic-embed-text:latest")
+        ]})
+
+    async def show(self, request):
+        return web.json_response({"modelfile": "", "parameters": "", "template": "", "details": {}, "model_info": {}})
+
+    async def _embed_delay(self):
+        if self.config.embed_latency_ms:
+            await asyncio.sleep(self.config.embed_latency_ms / 1000)
+
+    async def embed(self, request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await self._embed_delay()
+        self.stats["embed_requests"] += 1
+        self.stats["embedded_texts"] += len(inputs)
+        return web.json_response({
+            "model": body.get("model"),
+            "embeddings": [embed_text(text, self.config.embedding_dim) for text in inputs],
+            "total_duration": 0,
+            "load_duration": 0,
+            "prompt_eval_count": sum(len(WORD_RE.findall(t)) for t in inputs),
+        })
+
+    async def embeddings_legacy(self, request):
+        body = await request.json()
+        await self._embed_delay()
+        self.stats["embed_requests"] += 1
+        self.stats["embedded_texts"] += 1
+        return web.json_response({"embedding": embed_text(body.get("prompt", ""), self.config.embedding_dim)})
+
+    async def _stream(self, request, body, prompt: str, wrap):
+        started = time.perf_counter()
+        tokens = _answer_tokens(prompt, self.config.answer_tokens)
+        prompt_tokens = len(WORD_RE.findall(prompt))
+        model = body.get("model")
+        per_token = 1 / self.config.tokens_per_second if self.config.tokens_per_second else 0
+
+        if self.config.first_token_ms:
+            await asyncio.sleep(self.config.first_token_ms / 1000)
+
+        if body.get("stream", True) is False:
+            if per_token:
+                await asyncio.sleep(per_token * len(tokens))
+            payload = _done_fields(model, prompt_tokens, len(tokens), started)
+            payload.update(wrap("".join(tokens)))
+            return web.json_response(payload)
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for i, token in enumerate(tokens):
+            if per_token and i:
+                await asyncio.sleep(per_token)
+            chunk = {"model": model, "created_at": _now(), "done": False}
+            chunk.update(wrap(token))
+            await response.write((json.dumps(chunk) + "\n").encode("utf-8"))
+        final = _done_fields(model, prompt_tokens, len(tokens), started)
+        final.update(wrap(""))
+        await response.write((json.dumps(final) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def chat(self, request):
+        body = await request.json()
+        self.stats["chat_requests"] += 1
+        prompt = " ".join(m.get("content", "") for m in body.get("messages", []) if isinstance(m.get("content"), str))
+        return await self._stream(request, body, prompt, lambda text: {"message": {"role": "assistant", "content": text}})
+
+    async def generate(self, request):
+        body = await request.json()
+        self.stats["generate_requests"] += 1
+        prompt = body.get("prompt", "")
+        if not prompt:
+            # Empty prompt is Ollama's "load the model" call
+            return web.json_response({"model": body.get("model"), "created_at": _now(), "response": "", "done": True, "done_reason": "load"})
+        return await self._stream(request, body, prompt, lambda text: {"response": text})
+
+
+class FakeOllamaServer:
+    """Runs a FakeOllama app on a background thread; used by the benchmark runner."""
+
+    def __init__(self, config: FakeOllamaConfig = None, host: str = "127.0.0.1", port: int = 11500):
+        self.fake = FakeOllama(config)
+        self.host = host
+        self.port = port
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self.fake.build_app(), access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        self._loop.run_until_complete(web.TCPSite(self._runner, self.host, self.port).start())
+        self._started.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fake-ollama", daemon=True)
+        self._thread.start()
+        if not self._started.wait(timeout=10):
+            raise RuntimeError("fake Ollama server did not start")
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--embedding-dim", type=int, default=EMBEDDING_DIM)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--first-token-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--answer-tokens", type=int, default=32)
+
+
+def config_from_args(args) -> FakeOllamaConfig:
+    return FakeOllamaConfig(
+        embedding_dim=args.embedding_dim,
+        embed_latency_ms=args.embed_latency_ms,
+        first_token_ms=args.first_token_ms,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(FakeOllama(config_from_args(args)).build_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Seeds a throwaway SQLite database and Chroma directory for benchmarks.
+
+Creates N tenants (user + domain + metric), M chunks per tenant in Chroma embedded with the
+fake Ollama embedding function, and a few lead sessions per tenant. Everything is derived
+from --seed, so two runs with the same arguments produce the same data.
+
+    python -m benchmarks.fixtures --workdir /tmp/aisitebot-bench --tenants 20 --chunks 500
+
+A `fixture.json` manifest describing the tenants is written next to the data.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.fake_ollama import EMBEDDING_DIM, embed_text
+
+TENANT_PASSWORD = "bench-password"
+
+VOCABULARY = (
+    "pricing plan support account billing invoice refund shipping delivery order return warranty "
+    "product feature integration api webhook dashboard report export import security privacy "
+    "login password team member role permission trial upgrade downgrade cancel subscription "
+    "mobile desktop browser install update release notes contact office hours holiday location"
+).split()
+
+
+def database_url(workdir: str) -> str:
+    return f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+
+def chroma_directory(workdir: str) -> str:
+    return os.path.join(workdir, "chroma_db")
+
+
+def make_paragraph(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words)).capitalize() + "."
+
+
+def make_question(rng: random.Random) -> str:
+    return "What about " + " ".join(rng.sample(VOCABULARY, 4)) + "?"
+
+
+def seed_sql(workdir: str, tenants: int, leads_per_tenant: int, chunks: int, rng: random.Random):
+    from app import models
+    from app.core.security import get_password_hash
+
+    engine = create_engine(database_url(workdir), connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    # One hash for every tenant: hashing is deliberately slow and not what we're measuring here
+    hashed_password = get_password_hash(TENANT_PASSWORD)
+    manifest = []
+    now = datetime.utcnow()
+
+    try:
+        admin = models.User(email="admin@bench.example.com", username="bench-admin", hashed_password=hashed_password, is_superuser=True)
+        db.add(admin)
+
+        for i in range(tenants):
+            user = models.User(email=f"owner{i}@bench.example.com", username=f"owner{i}", hashed_password=hashed_password)
+            db.add(user)
+            db.flush()
+
+            domain = models.Domain(hostname=f"tenant{i}.bench.test", bot_id=f"bot-bench{i:04d}", owner_id=user.id)
+            db.add(domain)
+            db.flush()
+
+            db.add(models.Metric(domain_id=domain.id, chats_count=0, sources_count=max(1, chunks // 10)))
+
+            for j in range(leads_per_tenant):
+                session_id = f"bench-{i:04d}-{j:04d}"
+                started = now - timedelta(days=rng.randint(0, 120), minutes=rng.randint(0, 1440))
+                db.add(models.ChatSession(id=session_id, user_email=f"lead{j}@tenant{i}.example.com", domain_id=domain.id, created_at=started))
+                for k in range(rng.randint(2, 8)):
+                    db.add(models.ChatMessage(
+                        session_id=session_id,
+                        role="user" if k % 2 == 0 else "assistant",
+                        content=make_paragraph(rng, 20),
+                        timestamp=started + timedelta(seconds=30 * k)
+                    ))
+
+            manifest.append({
+                "email": user.email,
+                "password": TENANT_PASSWORD,
+                "domain_id": domain.id,
+                "bot_id": domain.bot_id,
+                "hostname": domain.hostname,
+            })
+        db.commit()
+    finally:
+        db.close()
+        engine.dispose()
+    return manifest
+
+
+def seed_chroma(workdir: str, manifest, chunks: int, rng: random.Random, batch_size: int = 500, dim: int = EMBEDDING_DIM):
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+    from app.services.vector_store import COLLECTION_NAME
+
+    client = chromadb.PersistentClient(path=chroma_directory(workdir), settings=ChromaSettings(anonymized_telemetry=False))
+    collection = client.get_or_create_collection(COLLECTION_NAME)
+
+    for tenant in manifest:
+        ids, documents, metadatas, embeddings = [], [], [], []
+        for c in range(chunks):
+            # ~10 chunks per source, like a typical crawled page
+            source = f"https://{tenant['hostname']}/page-{c // 10}"
+            text = " ".join(make_paragraph(rng, 40) for _ in range(4))
+            ids.append(f"{tenant['bot_id']}-{c}")
+            documents.append(text)
+            metadatas.append({"source": source, "type": "url", "botId": tenant["bot_id"]})
+            embeddings.append(embed_text(text, dim))
+            if len(ids) >= batch_size:
+                collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+                ids, documents, metadatas, embeddings = [], [], [], []
+        if ids:
+            collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+
+def seed(workdir: str, tenants: int = 10, chunks: int = 200, leads: int = 20, seed_value: int = 1234, dim: int = EMBEDDING_DIM):
+    """Wipes `workdir` and fills it with a fresh fixture. Returns the manifest dict."""
+    if os.path.exists(workdir):
+        shutil.rmtree(workdir)
+    os.makedirs(workdir)
+
+    rng = random.Random(seed_value)
+    tenants_manifest = seed_sql(workdir, tenants, leads, chunks, rng)
+    seed_chroma(workdir, tenants_manifest, chunks, rng, dim=dim)
+
+    manifest = {
+        "database_url": database_url(workdir),
+        "chroma_directory": chroma_directory(workdir),
+        "params": {"tenants": tenants, "chunks_per_tenant": chunks, "leads_per_tenant": leads, "seed": seed_value},
+        "admin": {"email": "admin@bench.example.com", "password": TENANT_PASSWORD},
+        "tenants": tenants_manifest,
+    }
+    with open(os.path.join(workdir, "fixture.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workdir", required=True)
+    parser.add_argument("--tenants", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=200, help="Chunks per tenant")
+    parser.add_argument("--leads", type=int, default=20, help="Lead sessions per tenant")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--embedding-dim", type=int, default=EMBEDDING_DIM)
+    args = parser.parse_args()
+
+    manifest = seed(args.workdir, args.tenants, args.chunks, args.leads, args.seed, args.embedding_dim)
+    print(f"Seeded {len(manifest['tenants'])} tenants into {args.workdir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Closed-loop async load generator and latency statistics used by the benchmark runner."""
+import asyncio
+import math
+import time
+from collections import Counter
+
+
+def percentile(sorted_values, pct: float):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_latencies(latencies):
+    values = sorted(latencies)
+    if not values:
+        return {"p50_ms": None, "p90_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    return {
+        "p50_ms": percentile(values, 50) * 1000,
+        "p90_ms": percentile(values, 90) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "mean_ms": sum(values) / len(values) * 1000,
+        "max_ms": values[-1] * 1000,
+    }
+
+
+async def run_load(name: str, operation, concurrency: int, duration_s: float = None, total_requests: int = None):
+    """
+    Runs `operation()` from `concurrency` concurrent workers until `duration_s` elapses or
+    `total_requests` have been issued. `operation` is an async callable returning
+    (label, ok, counters) where `counters` is a dict of numbers to sum up (e.g. chunks ingested).
+    """
+    if duration_s is None and total_requests is None:
+        raise ValueError("Either duration_s or total_requests is required")
+
+    latencies = {}
+    outcomes = Counter()
+    counters = Counter()
+    errors = []
+    issued = 0
+    started = time.perf_counter()
+    deadline = started + duration_s if duration_s is not None else None
+
+    def has_budget():
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        return total_requests is None or issued < total_requests
+
+    async def worker():
+        nonlocal issued
+        while has_budget():
+            issued += 1
+            t0 = time.perf_counter()
+            try:
+                label, ok, extra = await operation()
+            except Exception as e:
+                label, ok, extra = "exception", False, None
+                if len(errors) < 10:
+                    errors.append(repr(e))
+            latencies.setdefault(label, []).append(time.perf_counter() - t0)
+            outcomes["ok" if ok else "error"] += 1
+            if extra:
+                counters.update(extra)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    result = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "wall_s": wall,
+        "requests": len(all_latencies),
+        "errors": outcomes["error"],
+        "rps": len(all_latencies) / wall if wall else None,
+        **summarize_latencies(all_latencies),
+        "by_operation": {label: {"requests": len(values), **summarize_latencies(values)} for label, values in latencies.items()},
+        "counters": dict(counters),
+    }
+    for key, value in counters.items():
+        result[f"{key}_per_s"] = value / wall if wall else None
+    if errors:
+        result["sample_errors"] = errors
+    return result
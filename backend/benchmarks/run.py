@@ -0,0 +1,238 @@
+"""
+End-to-end benchmark runner. Fully offline:
+
+  1. seeds a SQLite + Chroma fixture (benchmarks.fixtures) in --workdir
+  2. starts the fake Ollama server (benchmarks.fake_ollama) on a background thread
+  3. starts the backend with uvicorn, pointed at the fixture and the fake Ollama
+  4. runs the selected load scenarios and writes one JSON result file
+
+    cd backend
+    python -m benchmarks.run --scenarios chat,ingest,dashboard,mixed --duration 30 --output results/run.json
+    python -m benchmarks.compare results/before.json results/after.json
+
+Scenarios:
+  chat       POST /chat against random tenants          -> rps, p50/p99
+  ingest     POST /ingest/file with generated text      -> chunks/s
+  dashboard  authenticated dashboard list endpoints     -> rps, p50/p99 per endpoint
+  mixed      70% chat, 25% dashboard, 5% ingest
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks import fake_ollama
+from benchmarks.fixtures import make_paragraph, make_question
+from benchmarks.load import run_load
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNKS_RE = re.compile(r"ingested (\d+) chunks")
+
+
+class BenchmarkContext:
+    def __init__(self, client: httpx.AsyncClient, manifest: dict, api_prefix: str, rng: random.Random, ingest_kb: int):
+        self.client = client
+        self.manifest = manifest
+        self.tenants = manifest["tenants"]
+        self.api = api_prefix
+        self.rng = rng
+        self.ingest_kb = ingest_kb
+        self.tokens = {}
+        self.ingest_counter = 0
+
+    async def login_all(self):
+        for tenant in self.tenants:
+            res = await self.client.post(
+                f"{self.api}/auth/login",
+                data={"username": tenant["email"], "password": tenant["password"]}
+            )
+            res.raise_for_status()
+            self.tokens[tenant["email"]] = res.json()["access_token"]
+
+    def tenant(self):
+        return self.rng.choice(self.tenants)
+
+    async def chat(self):
+        tenant = self.tenant()
+        res = await self.client.post(f"{self.api}/chat", json={
+            "question": make_question(self.rng),
+            "botId": tenant["bot_id"],
+            "hostname": tenant["hostname"],
+        })
+        return "chat", res.status_code == 200, None
+
+    async def ingest(self):
+        tenant = self.tenant()
+        self.ingest_counter += 1
+        paragraphs = []
+        size = 0
+        while size < self.ingest_kb * 1024:
+            paragraph = make_paragraph(self.rng, 60)
+            paragraphs.append(paragraph)
+            size += len(paragraph) + 2
+        content = "\n\n".join(paragraphs).encode("utf-8")
+        res = await self.client.post(
+            f"{self.api}/ingest/file",
+            data={"botId": tenant["bot_id"], "hostname": tenant["hostname"]},
+            files={"file": (f"bench-{self.ingest_counter}.txt", content, "text/plain")},
+        )
+        ok = res.status_code == 200
+        chunks = 0
+        if ok:
+            match = CHUNKS_RE.search(res.json().get("message", ""))
+            chunks = int(match.group(1)) if match else 0
+        return "ingest_file", ok, {"chunks": chunks, "bytes": len(content)}
+
+    async def dashboard(self):
+        tenant = self.tenant()
+        headers = {"Authorization": f"Bearer {self.tokens[tenant['email']]}"}
+        domain_id = tenant["domain_id"]
+        label, path = self.rng.choice([
+            ("dashboard_domains", "/dashboard"),
+            ("dashboard_leads", f"/dashboard/leads?domain_id={domain_id}"),
+            ("dashboard_metrics", f"/dashboard/{domain_id}/metrics"),
+            ("dashboard_documents", f"/dashboard/{domain_id}/documents"),
+        ])
+        res = await self.client.get(f"{self.api}{path}", headers=headers)
+        return label, res.status_code == 200, None
+
+    async def mixed(self):
+        roll = self.rng.random()
+        if roll < 0.70:
+            return await self.chat()
+        if roll < 0.95:
+            return await self.dashboard()
+        return await self.ingest()
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def seed_fixture(args):
+    subprocess.run([
+        sys.executable, "-m", "benchmarks.fixtures",
+        "--workdir", args.workdir,
+        "--tenants", str(args.tenants),
+        "--chunks", str(args.chunks),
+        "--leads", str(args.leads),
+        "--seed", str(args.seed),
+        "--embedding-dim", str(args.embedding_dim),
+    ], cwd=BACKEND_DIR, check=True)
+
+
+def start_backend(args, manifest: dict, ollama_url: str):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": manifest["database_url"],
+        "CHROMA_PERSIST_DIRECTORY": manifest["chroma_directory"],
+        "CHROMA_MODE": "embedded",
+        "OLLAMA_BASE_URL": ollama_url,
+    })
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.port)]
+    log = open(os.path.join(args.workdir, "backend.log"), "w")
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_until_ready(base_url: str, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"backend at {base_url} not ready after {timeout}s")
+
+
+async def run_scenarios(args, manifest: dict, base_url: str):
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        ctx = BenchmarkContext(client, manifest, args.api_prefix, random.Random(args.seed), args.ingest_kb)
+        await ctx.login_all()
+
+        operations = {"chat": ctx.chat, "ingest": ctx.ingest, "dashboard": ctx.dashboard, "mixed": ctx.mixed}
+        for name in args.scenarios:
+            if name not in operations:
+                raise SystemExit(f"Unknown scenario '{name}', expected one of {sorted(operations)}")
+            # Ingestion is heavier per request; keep it to a smaller, fixed budget
+            concurrency = args.ingest_concurrency if name == "ingest" else args.concurrency
+            print(f"Running {name} (concurrency={concurrency}, duration={args.duration}s)")
+            results.append(await run_load(name, operations[name], concurrency, duration_s=args.duration))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workdir", default=os.path.join(BACKEND_DIR, ".bench"))
+    parser.add_argument("--output", required=True, help="JSON result file")
+    parser.add_argument("--scenarios", default="chat,ingest,dashboard,mixed")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--ingest-concurrency", type=int, default=2)
+    parser.add_argument("--ingest-kb", type=int, default=32, help="Size of each generated upload")
+    parser.add_argument("--request-timeout", type=float, default=60)
+    parser.add_argument("--tenants", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=200, help="Chunks per tenant")
+    parser.add_argument("--leads", type=int, default=20, help="Lead sessions per tenant")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--api-prefix", default="/api/v1")
+    parser.add_argument("--reuse-fixture", action="store_true", help="Skip seeding and reuse --workdir as is")
+    fake_ollama.add_config_arguments(parser)
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+
+    if not args.reuse_fixture:
+        seed_fixture(args)
+    with open(os.path.join(args.workdir, "fixture.json")) as f:
+        manifest = json.load(f)
+
+    ollama = fake_ollama.FakeOllamaServer(fake_ollama.config_from_args(args), port=args.ollama_port).start()
+    backend = start_backend(args, manifest, ollama.base_url)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(base_url, timeout=120)
+        scenarios = asyncio.run(run_scenarios(args, manifest, base_url))
+    finally:
+        backend.terminate()
+        backend.wait(timeout=30)
+        ollama.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fixture": manifest["params"],
+            "fake_ollama": vars(fake_ollama.config_from_args(args)),
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+        },
+        "scenarios": {result["scenario"]: result for result in scenarios},
+        "fake_ollama_stats": ollama.fake.stats,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Measures cold start of the backend:
+
+  * import time of `app.main` in a fresh interpreter
+  * time from spawning uvicorn until /health answers, and until the first /chat succeeds
+
+Only uses HTTP against the spawned server, so the same script can be run on an older
+checkout to get the "before" numbers.
+
+    cd backend
+    python -m benchmarks.startup --bot-id bot-default --hostname localhost --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def measure_import(runs: int):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return {"runs": runs, "median_s": statistics.median(samples), "samples_s": samples}
+
+
+def _wait_for(check, deadline: float, interval: float = 0.05):
+    while time.perf_counter() < deadline:
+        try:
+            if check():
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(interval)
+    return False
+
+
+def measure_first_chat(args):
+    env = dict(os.environ)
+    if args.warmup:
+        env["WARMUP_ON_STARTUP"] = "true"
+
+    base = f"http://127.0.0.1:{args.port}"
+    chat_body = {"question": args.question, "botId": args.bot_id, "hostname": args.hostname}
+
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + args.timeout
+        if not _wait_for(lambda: requests.get(f"{base}/health", timeout=1).ok, deadline):
+            raise RuntimeError("server did not answer /health in time")
+        health_s = time.perf_counter() - started
+
+        chat_started = time.perf_counter()
+        if not _wait_for(lambda: requests.post(f"{base}{args.api_prefix}/chat", json=chat_body, timeout=args.timeout).ok, deadline):
+            raise RuntimeError("no successful /chat in time")
+        done = time.perf_counter()
+
+        return {
+            "warmup": args.warmup,
+            "time_to_health_s": health_s,
+            "first_chat_latency_s": done - chat_started,
+            "time_to_first_chat_s": done - started,
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bot-id", default="bot-default")
+    parser.add_argument("--hostname", default="localhost")
+    parser.add_argument("--question", default="What is this site about?")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--api-prefix", default="/api/v1")
+    parser.add_argument("--import-runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--warmup", action="store_true", help="Start the server with WARMUP_ON_STARTUP=true")
+    parser.add_argument("--skip-chat", action="store_true", help="Only measure import time")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {"import": measure_import(args.import_runs)}
+    if not args.skip_chat:
+        results["first_chat"] = measure_first_chat(args)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway database before anything imports app.core.database,
+# so tests never touch the checked-in sql_app.db
+_workdir = tempfile.mkdtemp(prefix="aisitebot-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db():
+    """A session on a freshly created schema; every table is emptied afterwards."""
+    from app.core.database import Base, SessionLocal, engine, init_models
+
+    init_models()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+        with engine.begin() as connection:
+            for table in reversed(Base.metadata.sorted_tables):
+                connection.execute(table.delete())
+
+
+@pytest.fixture
+def domain(db):
+    from app import models
+
+    user = models.User(email="owner@example.com", username="owner", hashed_password="x")
+    db.add(user)
+    db.flush()
+    domain = models.Domain(hostname="site.example.com", bot_id="bot-test", owner_id=user.id)
+    db.add(domain)
+    db.flush()
+    db.add(models.Metric(domain_id=domain.id, sources_count=1, chats_count=0))
+    db.commit()
+    return domain
@@ -0,0 +1,89 @@
+import asyncio
+import io
+
+import pytest
+
+from app.core.config import settings
+from app.services import ingestion
+from app.services.chunking import TokenChunker
+from app.services.ingestion import IngestionService, file_source
+
+
+class FakeVectorStore:
+    """Keeps chunks in a dict; a batch containing `fail_on` text fails like an embedding error."""
+
+    def __init__(self, fail_on: str = None):
+        self.chunks = {}
+        self.fail_on = fail_on
+
+    def add_documents(self, documents, ids=None):
+        if self.fail_on and any(self.fail_on in doc.page_content for doc in documents):
+            raise RuntimeError("embedding backend unavailable")
+        for doc, id_ in zip(documents, ids):
+            self.chunks[id_] = (doc.metadata["source"], doc.page_content)
+
+    def delete_chunks(self, ids, bot_id=None):
+        for id_ in ids:
+            self.chunks.pop(id_, None)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    # Parse in threads instead of the process pool, one chunk per embedding batch
+    monkeypatch.setattr(ingestion, "get_process_pool", lambda: None)
+    monkeypatch.setattr(ingestion, "process_pool_size", lambda: 1)
+    monkeypatch.setattr(settings, "BULK_EMBED_BATCH_SIZE", 1)
+    service = IngestionService()
+    service.chunker = TokenChunker(chunk_tokens=6, overlap_tokens=0)
+    return service
+
+
+def _text(*paragraphs):
+    return "\n\n".join(paragraphs).encode("utf-8")
+
+
+def test_failed_source_is_removed_without_touching_other_chunks_of_the_same_name(service):
+    store = FakeVectorStore(fail_on="BROKEN")
+    # Chunk of an earlier ingestion of the same file
+    store.chunks["earlier"] = ("faq.txt", "Old answer.")
+
+    sources = [
+        file_source("faq.txt", io.BytesIO(_text("First answer one.", "First answer two."))),
+        file_source("faq.txt", io.BytesIO(_text("Second answer one.", "Second answer two.", "BROKEN paragraph."))),
+    ]
+    results = asyncio.run(service.ingest_bulk(sources, "bot-1", store))
+
+    assert results[0]["status"] == "ingested" and results[0]["chunks"] == 2
+    assert results[1]["status"] == "failed" and results[1]["chunks"] == 0
+    assert "embedding backend unavailable" in results[1]["error"]
+    # The earlier ingestion and the successful same-named source are untouched,
+    # the failed source's already written chunks are gone
+    assert sorted(text for _, text in store.chunks.values()) == ["First answer one.", "First answer two.", "Old answer."]
+
+
+def test_cleanup_failure_marks_the_source_partial(service):
+    store = FakeVectorStore(fail_on="BROKEN")
+
+    def failing_delete(ids, bot_id=None):
+        raise RuntimeError("store down")
+    store.delete_chunks = failing_delete
+
+    sources = [file_source("a.txt", io.BytesIO(_text("Written chunk.", "BROKEN chunk.", "Never written.")))]
+    results = asyncio.run(service.ingest_bulk(sources, "bot-1", store))
+
+    assert results[0]["status"] == "partial"
+    assert "could not be removed: store down" in results[0]["error"]
+    # Nothing after the failed batch is written for a partial source
+    assert [text for _, text in store.chunks.values()] == ["Written chunk."]
+
+
+def test_unsupported_and_empty_sources_are_skipped(service):
+    store = FakeVectorStore()
+    sources = [
+        file_source("image.png", io.BytesIO(b"\x89PNG\r\n\x1a\n")),
+        file_source("empty.txt", io.BytesIO(b"   ")),
+        file_source("ok.txt", io.BytesIO(_text("Fine."))),
+    ]
+    results = asyncio.run(service.ingest_bulk(sources, "bot-1", store))
+    assert [result["status"] for result in results] == ["skipped", "skipped", "ingested"]
+    assert list(store.chunks.values()) == [("ok.txt", "Fine.")]
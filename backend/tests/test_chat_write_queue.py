@@ -0,0 +1,166 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from app import models
+from app.core.config import settings
+from app.services import analytics
+from app.services.chat_persistence import ChatWriteQueue, insert_session, merge_session
+
+
+@pytest.fixture
+def queue(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "CHAT_WRITE_DEAD_LETTER_FILE", str(tmp_path / "dead.jsonl"))
+    queue = ChatWriteQueue()
+    # Flushed explicitly by the tests instead of by the background writer
+    queue._ensure_running = lambda: None
+    return queue
+
+
+def _chat(queue, session_id, domain_id, question="Question?", sources=("faq.md",)):
+    now = datetime.utcnow()
+    increments = analytics.chat_increments(domain_id, list(sources), first_today=True, new_lead=False)
+    return queue.add_chat(session_id, domain_id, question, now, "Answer.", now, increments=increments)
+
+
+def _messages(db, session_id=None):
+    query = db.query(models.ChatMessage)
+    if session_id:
+        query = query.filter(models.ChatMessage.session_id == session_id)
+    return [(message.session_id, message.role, message.content) for message in query.order_by(models.ChatMessage.id)]
+
+
+def test_flush_writes_messages_counters_and_rollups(db, domain, queue):
+    insert_session(db, "s1", domain.id)
+    db.commit()
+    assert _chat(queue, "s1", domain.id)
+    assert _chat(queue, "s1", domain.id, question="Again?")
+    assert queue.has_pending_messages("s1")
+    assert _messages(db) == []
+
+    queue.flush()
+
+    assert not queue.has_pending_messages("s1")
+    assert _messages(db) == [
+        ("s1", "user", "Question?"), ("s1", "assistant", "Answer."),
+        ("s1", "user", "Again?"), ("s1", "assistant", "Answer."),
+    ]
+    db.expire_all()
+    assert db.query(models.Metric).filter(models.Metric.domain_id == domain.id).one().chats_count == 2
+    stats = db.query(models.DomainDailyStats).filter(models.DomainDailyStats.domain_id == domain.id).one()
+    assert (stats.chats, stats.sessions, stats.unanswered) == (2, 2, 0)
+    assert db.query(models.DomainSourceStats).one().citations == 2
+
+
+def test_failed_flush_is_requeued_then_dead_lettered(db, domain, queue, monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_WRITE_MAX_RETRIES", 2)
+    write = queue._write
+
+    def failing_write(*args):
+        raise RuntimeError("database is locked")
+    queue._write = failing_write
+
+    _chat(queue, "s1", domain.id)
+    with pytest.raises(RuntimeError):
+        queue.flush()
+    # Kept in front of the queue for the next attempt
+    assert queue.has_pending_messages("s1")
+    _chat(queue, "s2", domain.id)
+
+    # Second failure in a row: the batch is written to the dead-letter file and dropped
+    queue.flush()
+    assert not queue.has_pending_messages("s1") and not queue.has_pending_messages("s2")
+    with open(settings.CHAT_WRITE_DEAD_LETTER_FILE) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 1
+    assert records[0]["error"] == "database is locked"
+    assert [message["session_id"] for message in records[0]["messages"]] == ["s1", "s1", "s2", "s2"]
+    assert records[0]["chats"] == {str(domain.id): 2}
+
+    # Later batches are written normally again
+    queue._write = write
+    _chat(queue, "s3", domain.id)
+    queue.flush()
+    assert [row[0] for row in _messages(db)] == ["s3", "s3"]
+
+
+def test_full_queue_refuses_and_write_now_bypasses_it(db, domain, queue, monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_WRITE_QUEUE_LIMIT", 3)
+    assert _chat(queue, "s1", domain.id)  # 2 messages + 2 increments
+    assert not _chat(queue, "s2", domain.id)
+    assert not queue.has_pending_messages("s2")
+
+    now = datetime.utcnow()
+    queue.write_now("s2", domain.id, "Now?", now, "Yes.", now)
+    assert _messages(db, "s2") == [("s2", "user", "Now?"), ("s2", "assistant", "Yes.")]
+
+
+def test_stop_drains_the_queue_and_is_final(db, domain, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "CHAT_WRITE_DEAD_LETTER_FILE", str(tmp_path / "dead.jsonl"))
+    queue = ChatWriteQueue()
+    queue.start()
+    _chat(queue, "s1", domain.id)
+    queue.stop()
+
+    assert [row[0] for row in _messages(db)] == ["s1", "s1"]
+    assert not queue._thread.is_alive()
+    # Nothing is queued or restarted after stop(); callers write synchronously instead
+    assert not _chat(queue, "s2", domain.id)
+    assert not queue._thread.is_alive()
+
+
+def test_stop_dead_letters_what_it_cannot_write(db, domain, queue):
+    _chat(queue, "s1", domain.id)
+
+    def failing_write(*args):
+        raise RuntimeError("disk full")
+    queue._write = failing_write
+
+    with pytest.raises(RuntimeError):
+        queue.stop()
+    with open(settings.CHAT_WRITE_DEAD_LETTER_FILE) as f:
+        assert [json.loads(line)["error"] for line in f] == ["disk full"]
+    assert not queue.has_pending_messages("s1")
+
+
+def test_insert_session_reports_whether_it_created_the_row(db, domain):
+    assert insert_session(db, "s1", domain.id, "lead@example.com")
+    assert not insert_session(db, "s1", domain.id)
+    db.commit()
+    assert db.query(models.ChatSession).filter(models.ChatSession.id == "s1").one().user_email == "lead@example.com"
+
+
+def test_messages_queued_elsewhere_follow_a_merged_session(db, domain, queue):
+    insert_session(db, "anonymous", domain.id)
+    insert_session(db, "lead", domain.id, "lead@example.com")
+    db.commit()
+    # This worker's history of the anonymous session is written before the merge
+    _chat(queue, "anonymous", domain.id, question="Before?")
+    queue.flush()
+
+    # Another worker still holds a message for it while the visitor is identified
+    other_worker = ChatWriteQueue()
+    other_worker._ensure_running = lambda: None
+    _chat(other_worker, "anonymous", domain.id, question="Late?")
+
+    merge_session(db, "anonymous", "lead")
+    db.commit()
+    other_worker.flush()
+
+    assert db.query(models.ChatSession.id).all() == [("lead",)]
+    assert [content for _, _, content in _messages(db, "lead")] == ["Before?", "Answer.", "Late?", "Answer."]
+    assert _messages(db, "anonymous") == []
+
+
+def test_merge_follows_earlier_merges(db, domain, queue):
+    for session_id in ("first", "second", "third"):
+        insert_session(db, session_id, domain.id)
+    db.commit()
+    merge_session(db, "first", "second")
+    merge_session(db, "second", "third")
+    db.commit()
+
+    _chat(queue, "first", domain.id, question="Very late?")
+    queue.flush()
+    assert [content for _, _, content in _messages(db, "third")] == ["Very late?", "Answer."]
@@ -0,0 +1,50 @@
+from app.services.chunking import TokenChunker
+
+
+def _paragraphs(count: int):
+    return [f"Paragraph {i} talks about topic {i} in a few words." for i in range(count)]
+
+
+def test_chunks_respect_token_budget_and_paragraph_boundaries():
+    chunker = TokenChunker(chunk_tokens=40, overlap_tokens=0)
+    paragraphs = _paragraphs(12)
+    chunks = chunker.split_text("\n\n".join(paragraphs))
+
+    assert len(chunks) > 1
+    for text, _ in chunks:
+        assert chunker.count_tokens(text) <= 40
+        # Chunks are whole paragraphs, never cut mid-paragraph
+        assert all(part in paragraphs for part in text.split("\n\n"))
+    assert [part for text, _ in chunks for part in text.split("\n\n")] == paragraphs
+
+
+def test_chunks_are_labelled_with_their_last_heading_path():
+    chunker = TokenChunker(chunk_tokens=400, overlap_tokens=0)
+    text = "# Guide\n\nIntro text.\n\n## Install\n\nRun the installer.\n\n## Usage\n\nStart it."
+    chunks = chunker.split_text(text)
+    assert chunks == [(text, "Guide > Usage")]
+
+    small = TokenChunker(chunk_tokens=12, overlap_tokens=0)
+    sections = [section for _, section in small.split_text(text)]
+    assert sections[0].startswith("Guide")
+    assert sections[-1] == "Guide > Usage"
+
+
+def test_run_on_text_is_windowed_with_overlap():
+    chunker = TokenChunker(chunk_tokens=20, overlap_tokens=5)
+    text = " ".join(f"word{i}" for i in range(200))
+    chunks = [chunk for chunk, _ in chunker.split_text(text)]
+
+    assert len(chunks) > 1
+    encode = lambda value: chunker.encoding.encode(value, disallowed_special=())
+    for previous, current in zip(chunks, chunks[1:]):
+        assert len(encode(previous)) <= 20
+        # Each window starts with the last overlap_tokens tokens of the previous one
+        assert encode(current)[:5] == encode(previous)[-5:]
+    assert chunker.encoding.decode(encode(chunks[-1])).rstrip().endswith("word199")
+
+
+def test_split_items_adds_section_metadata():
+    chunker = TokenChunker(chunk_tokens=400, overlap_tokens=0)
+    items = chunker.split_items([("# FAQ\n\nQuestion and answer.", {"source": "faq.md", "botId": "bot-1"})])
+    assert items == [("# FAQ\n\nQuestion and answer.", {"source": "faq.md", "botId": "bot-1", "section": "FAQ"})]
@@ -0,0 +1,26 @@
+from app.services.extraction import extract_html, extract_markdown
+
+
+def test_extract_html_keeps_structure_and_drops_boilerplate():
+    html = b"""
+    <html><body>
+      <nav><a href="/">Home</a> <a href="/about">About</a></nav>
+      <main>
+        <h1>Pricing</h1>
+        <p>Plans start at 10 EUR.</p>
+        <table><tr><th>Plan</th><th>Price</th></tr><tr><td>Pro</td><td>20</td></tr></table>
+      </main>
+      <footer>Copyright</footer>
+    </body></html>
+    """
+    assert extract_html(html) == "# Pricing\n\nPlans start at 10 EUR.\n\nPlan | Price\nPro | 20"
+
+
+def test_extract_html_keeps_list_item_text_after_nested_list():
+    html = b"<main><ul><li>One<ul><li>a</li></ul>tail</li><li>Two <b>bold</b>!</li></ul></main>"
+    assert extract_html(html) == "- One tail\n  - a\n- Two bold!"
+
+
+def test_extract_markdown_strips_links_and_front_matter():
+    text = "---\ntitle: x\n---\nTitle\n=====\n\nSee [the docs](https://example.com) ![logo](l.png)."
+    assert extract_markdown(text) == "# Title\n\nSee the docs ."
@@ -0,0 +1,59 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import widget
+from app.core.security import create_access_token, create_widget_token, decode_widget_token
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(widget.router, prefix="/api/v1")
+    return TestClient(app)
+
+
+def test_widget_token_round_trip():
+    now = int(time.time())
+    token = create_widget_token("bot-1", "site.example.com", 7, now, now + 60)
+    claims = decode_widget_token(token)
+    assert (claims["bot"], claims["host"], claims["did"], claims["iat"], claims["exp"]) == \
+        ("bot-1", "site.example.com", 7, now, now + 60)
+
+
+def test_expired_tampered_and_foreign_tokens_are_rejected():
+    now = int(time.time())
+    assert decode_widget_token(create_widget_token("bot-1", "site.example.com", 7, now - 120, now - 60)) is None
+
+    token = create_widget_token("bot-1", "site.example.com", 7, now, now + 60)
+    header, payload, signature = token.split(".")
+    assert decode_widget_token(f"{header}.{payload}.{signature[::-1]}") is None
+
+    # A dashboard access token is signed with the same key but is not a widget token
+    assert decode_widget_token(create_access_token("owner@example.com")) is None
+    assert decode_widget_token("not-a-token") is None
+
+
+def test_bootstrap_issues_a_token_for_the_registered_hostname(domain):
+    client = _client()
+    response = client.get("/api/v1/widget/bootstrap", params={"botId": domain.bot_id, "hostname": domain.hostname})
+    assert response.status_code == 200
+    assert "public" in response.headers["cache-control"]
+
+    body = response.json()
+    claims = decode_widget_token(body["token"])
+    assert (claims["bot"], claims["host"], claims["did"]) == (domain.bot_id, domain.hostname, domain.id)
+    assert claims["exp"] == body["expiresAt"] > time.time()
+
+    # Same time bucket: same body, so a matching ETag is answered with 304
+    cached = client.get(
+        "/api/v1/widget/bootstrap",
+        params={"botId": domain.bot_id, "hostname": domain.hostname},
+        headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert cached.status_code == 304
+
+
+def test_bootstrap_rejects_another_hostname(domain):
+    response = _client().get("/api/v1/widget/bootstrap", params={"botId": domain.bot_id, "hostname": "evil.example.com"})
+    assert response.status_code == 403
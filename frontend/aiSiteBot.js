@@ -4,9 +4,16 @@
     const botId = script.getAttribute('data-bot-id') || 'bot-default';
     const currentHostname = window.location.hostname;
 
-    // Auto-detect base URLs based on script location
-    const frontendBase = script.src.split('/aiSiteBot.js')[0];
-    const backendBase = script.getAttribute('data-api-url') || (frontendBase.replace(':5173', ':8000') + '/api/v1');
+    // Auto-detect base URLs based on script location. The script is either served by the
+    // frontend (…/aiSiteBot.js) or, cached and compressed, by the API (…/api/v1/widget/aiSiteBot.js).
+    const scriptBase = script.src.split('/aiSiteBot.js')[0];
+    const servedByApi = scriptBase.endsWith('/widget');
+    const backendBase = script.getAttribute('data-api-url') || (servedByApi
+        ? scriptBase.slice(0, -'/widget'.length)
+        : scriptBase.replace(':5173', ':8000') + '/api/v1');
+    const frontendBase = script.getAttribute('data-app-url') || (servedByApi
+        ? new URL(scriptBase).origin.replace(':8000', ':5173')
+        : scriptBase);
 
     // 2. Create Floating Button
     const chatButton = document.createElement('button');
@@ -54,9 +61,8 @@
         border: '1px solid #e5e7eb'
     });
 
-    // 4. Create Iframe
+    // 4. Create Iframe (loaded on first open, once we have a widget token)
     const iframe = document.createElement('iframe');
-    iframe.src = `${frontendBase}/?botId=${botId}&hostname=${currentHostname}`;
     Object.assign(iframe.style, {
         width: '100%',
         height: '100%',
@@ -65,7 +71,31 @@
     container.appendChild(iframe);
     document.body.appendChild(container);
 
-    // 5. Toggle Logic with Validation
+    // 5. Bootstrap: a cacheable GET that returns a short-lived signed widget token.
+    // The token is reused across page views until it expires.
+    const tokenKey = `aisitebot:${botId}:${currentHostname}`;
+
+    const getWidgetToken = async () => {
+        try {
+            const cached = JSON.parse(sessionStorage.getItem(tokenKey) || 'null');
+            if (cached && cached.expiresAt * 1000 > Date.now() + 60000) {
+                return cached.token;
+            }
+        } catch (err) {
+            sessionStorage.removeItem(tokenKey);
+        }
+
+        const params = new URLSearchParams({ botId, hostname: currentHostname });
+        const res = await fetch(`${backendBase}/widget/bootstrap?${params}`);
+        const data = await res.json();
+        if (!res.ok) {
+            throw new Error(data.detail || 'Access denied');
+        }
+        sessionStorage.setItem(tokenKey, JSON.stringify({ token: data.token, expiresAt: data.expiresAt }));
+        return data.token;
+    };
+
+    // 6. Toggle Logic with Validation
     let isValidated = false;
 
     chatButton.addEventListener('click', async () => {
@@ -77,21 +107,13 @@
 
         if (!isValidated) {
             try {
-                const res = await fetch(`${backendBase}/validateBot`, {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ botId, hostname: currentHostname })
-                });
-
-                if (res.ok) {
-                    isValidated = true;
-                } else {
-                    const data = await res.json();
-                    alert(`ChatBot Error: ${data.detail || 'Access denied'}`);
-                    return;
-                }
+                const widgetToken = await getWidgetToken();
+                const params = new URLSearchParams({ botId, hostname: currentHostname, widgetToken });
+                iframe.src = `${frontendBase}/?${params}`;
+                isValidated = true;
             } catch (err) {
                 console.error('AISiteBot validation failed:', err);
+                alert(`ChatBot Error: ${err.message || 'Access denied'}`);
                 return;
             }
         }
@@ -33,6 +33,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = () => {
     const searchParams = new URLSearchParams(window.location.search);
     const botId = searchParams.get('botId') || 'bot-default';
     const parentHostname = searchParams.get('hostname') || window.location.hostname;
+    const widgetToken = searchParams.get('widgetToken');
 
     useEffect(() => {
         if (scrollRef.current) {
@@ -55,7 +56,8 @@ const ChatInterface: React.FC<ChatInterfaceProps> = () => {
                 botId: botId,
                 hostname: parentHostname,
                 sessionId: sessionId,
-                userEmail: userEmail
+                userEmail: userEmail,
+                widgetToken: widgetToken
             });
 
             if (response.data.sessionId) {
@@ -44,10 +44,29 @@ interface Metrics {
     sources_count: number;
 }
 
+interface Analytics {
+    chats: number;
+    sessions: number;
+    leads: number;
+    unanswered: number;
+    sources_added: number;
+    daily: { day: string; chats: number; sessions: number; leads: number; unanswered: number }[];
+    top_sources: { source: string; citations: number }[];
+}
+
+interface DomainSummary extends Domain {
+    metrics: Metrics;
+    analytics: Analytics;
+    leads_total: number;
+    leads: any[];
+    documents: any[];
+}
+
 const Dashboard: React.FC = () => {
-    const [domains, setDomains] = useState<Domain[]>([]);
-    const [selectedDomain, setSelectedDomain] = useState<Domain | null>(null);
+    const [domains, setDomains] = useState<DomainSummary[]>([]);
+    const [selectedDomain, setSelectedDomain] = useState<DomainSummary | null>(null);
     const [metrics, setMetrics] = useState<Metrics | null>(null);
+    const [analytics, setAnalytics] = useState<Analytics | null>(null);
     const [isLoading, setIsLoading] = useState(true);
     const [activeTab, setActiveTab] = useState<'stats' | 'leads' | 'resources' | 'settings'>('stats');
     const [leads, setLeads] = useState<any[]>([]);
@@ -57,6 +76,7 @@ const Dashboard: React.FC = () => {
     const [isSidebarOpen, setIsSidebarOpen] = useState(false);
     const navigate = useNavigate();
 
+    // One request returns metrics, analytics, leads and documents for every domain
     const fetchDashboardData = async () => {
         const token = localStorage.getItem('token');
         if (!token) {
@@ -65,13 +85,14 @@ const Dashboard: React.FC = () => {
         }
 
         try {
-            const domainRes = await axios.get('/api/v1/dashboard', {
+            const summaryRes = await axios.get('/api/v1/dashboard/summary', {
                 headers: { Authorization: `Bearer ${token}` }
             });
-            setDomains(domainRes.data);
-            if (domainRes.data.length > 0) {
-                setSelectedDomain(domainRes.data[0]);
-            }
+            const summaries: DomainSummary[] = summaryRes.data.domains;
+            setDomains(summaries);
+            setSelectedDomain(current =>
+                summaries.find(d => d.id === current?.id) || summaries[0] || null
+            );
         } catch (err) {
             console.error(err);
             navigate('/login');
@@ -80,45 +101,6 @@ const Dashboard: React.FC = () => {
         }
     };
 
-    const fetchMetrics = async (domainId: number) => {
-        const token = localStorage.getItem('token');
-        try {
-            const metricRes = await axios.get(`/api/v1/dashboard/${domainId}/metrics`, {
-                headers: { Authorization: `Bearer ${token}` }
-            });
-            setMetrics(metricRes.data);
-        } catch (err) {
-            console.error(err);
-        }
-    };
-
-    const fetchLeads = async (domainId?: number) => {
-        const token = localStorage.getItem('token');
-        try {
-            const url = domainId
-                ? `/api/v1/dashboard/leads?domain_id=${domainId}`
-                : '/api/v1/dashboard/leads';
-            const leadsRes = await axios.get(url, {
-                headers: { Authorization: `Bearer ${token}` }
-            });
-            setLeads(leadsRes.data);
-        } catch (err) {
-            console.error(err);
-        }
-    };
-
-    const fetchDocuments = async (domainId: number) => {
-        const token = localStorage.getItem('token');
-        try {
-            const docRes = await axios.get(`/api/v1/dashboard/${domainId}/documents`, {
-                headers: { Authorization: `Bearer ${token}` }
-            });
-            setDocuments(docRes.data.documents);
-        } catch (err) {
-            console.error('Failed to fetch documents:', err);
-        }
-    };
-
     const deleteDocument = async (source: string) => {
         if (!window.confirm(`Are you sure you want to delete "${source}"?`)) return;
         const token = localStorage.getItem('token');
@@ -127,10 +109,7 @@ const Dashboard: React.FC = () => {
                 headers: { Authorization: `Bearer ${token}` },
                 data: { source }
             });
-            if (selectedDomain) {
-                fetchDocuments(selectedDomain.id);
-                fetchMetrics(selectedDomain.id);
-            }
+            fetchDashboardData();
         } catch (err) {
             console.error('Failed to delete document:', err);
             alert('Failed to delete document. Please try again.');
@@ -143,16 +122,19 @@ const Dashboard: React.FC = () => {
 
     useEffect(() => {
         if (selectedDomain) {
-            // Reset selected lead when domain changes
-            setSelectedLead(null);
-            setShowDetails(false);
-
-            fetchMetrics(selectedDomain.id);
-            fetchLeads(selectedDomain.id);
-            fetchDocuments(selectedDomain.id);
+            setMetrics(selectedDomain.metrics);
+            setAnalytics(selectedDomain.analytics);
+            setLeads(selectedDomain.leads);
+            setDocuments(selectedDomain.documents);
         }
     }, [selectedDomain]);
 
+    useEffect(() => {
+        // Reset selected lead when domain changes
+        setSelectedLead(null);
+        setShowDetails(false);
+    }, [selectedDomain?.id]);
+
     const handleLogout = () => {
         localStorage.removeItem('token');
         navigate('/login');
@@ -272,11 +254,52 @@ const Dashboard: React.FC = () => {
                                 />
                                 <StatCard
                                     title="Active Leads"
-                                    value={leads.length}
+                                    value={selectedDomain?.leads_total || 0}
                                     icon={<Users className="w-6 h-6 text-indigo-500" />}
                                 />
                             </div>
 
+                            <div className="grid grid-cols-1 md:grid-cols-2 gap-6 mb-8">
+                                <div className="bg-white rounded-xl border border-slate-200 p-6">
+                                    <h3 className="font-bold text-slate-900 mb-4">Last 30 Days</h3>
+                                    <div className="grid grid-cols-2 gap-4 mb-4">
+                                        <DetailItem icon={<MessageSquare className="w-3 h-3" />} label="Questions" value={analytics?.chats || 0} />
+                                        <DetailItem icon={<Users className="w-3 h-3" />} label="Sessions" value={analytics?.sessions || 0} />
+                                        <DetailItem icon={<Mail className="w-3 h-3" />} label="Leads Captured" value={analytics?.leads || 0} />
+                                        <DetailItem icon={<Info className="w-3 h-3" />} label="No Source Found" value={analytics?.unanswered || 0} />
+                                    </div>
+                                    <div className="flex items-end gap-1 h-24">
+                                        {(analytics?.daily || []).map(d => {
+                                            const peak = Math.max(...(analytics?.daily || []).map(x => x.chats), 1);
+                                            return (
+                                                <div
+                                                    key={d.day}
+                                                    title={`${d.day}: ${d.chats} questions`}
+                                                    className="flex-1 bg-blue-500/80 rounded-t"
+                                                    style={{ height: `${Math.max(4, (d.chats / peak) * 100)}%` }}
+                                                />
+                                            );
+                                        })}
+                                    </div>
+                                </div>
+
+                                <div className="bg-white rounded-xl border border-slate-200 p-6">
+                                    <h3 className="font-bold text-slate-900 mb-4">Top Cited Sources</h3>
+                                    {(analytics?.top_sources || []).length === 0 ? (
+                                        <p className="text-sm text-slate-400">No citations yet</p>
+                                    ) : (
+                                        <div className="space-y-3">
+                                            {analytics?.top_sources.map(s => (
+                                                <div key={s.source} className="flex justify-between gap-4">
+                                                    <span className="text-sm text-slate-700 truncate">{s.source}</span>
+                                                    <span className="text-xs font-bold text-slate-900">{s.citations}</span>
+                                                </div>
+                                            ))}
+                                        </div>
+                                    )}
+                                </div>
+                            </div>
+
                             <div className="bg-white rounded-xl border border-slate-200 p-6">
                                 <h3 className="font-bold text-slate-900 mb-4">Instance Details</h3>
                                 <div className="space-y-4">
@@ -486,12 +509,7 @@ const Dashboard: React.FC = () => {
                                         botId={selectedDomain?.bot_id}
                                         hostname={selectedDomain?.hostname}
                                         showSourcesList={false}
-                                        onIngestSuccess={() => {
-                                            if (selectedDomain) {
-                                                fetchDocuments(selectedDomain.id);
-                                                fetchMetrics(selectedDomain.id);
-                                            }
-                                        }}
+                                        onIngestSuccess={fetchDashboardData}
                                     />
                                 </div>
 